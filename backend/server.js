@@ -3,6 +3,7 @@ const multer = require("multer");
 const fs = require("fs");
 const path = require("path");
 const cors = require("cors");
+const { execFile } = require("child_process");
 
 const app = express();
 app.use(express.urlencoded({ limit: "1mb", extended: true }));
@@ -11,7 +12,9 @@ const PORT = 4000; // Change if needed
 const SOUND_DIR = path.join(__dirname, "../bot/sounds/");
 const SOUNDS_FILE = path.join(__dirname, "../bot/sounds.json");
 const USERS_FILE = path.join(__dirname, "../bot/users.json");
-const LOGS_FILE = path.join(__dirname, "../bot/logs.json");
+const PLAY_COUNTS_FILE = path.join(__dirname, "../bot/playCounts.json");
+const LOGS_DIR = path.join(__dirname, "../bot/logs/");
+const LOG_QUERY = path.join(__dirname, "../bot/logquery.py");
 
 // Enable CORS
 app.use(cors());
@@ -22,6 +25,23 @@ if (!fs.existsSync(SOUND_DIR)) {
   fs.mkdirSync(SOUND_DIR, { recursive: true });
 }
 
+// Write a JSON file through a temporary file so the bot never reads a half-written one
+const writeJsonFile = (file, data) => {
+  const tmp = `${file}.tmp`;
+  fs.writeFileSync(tmp, JSON.stringify(data, null, 2));
+  fs.renameSync(tmp, file);
+};
+
+// Play counts are kept by the bot in its database and exported to playCounts.json;
+// they replace the playedBy lists sounds.json still carries from before that
+const withPlayCounts = (sounds) => {
+  if (!fs.existsSync(PLAY_COUNTS_FILE)) {
+    return sounds;
+  }
+  const counts = JSON.parse(fs.readFileSync(PLAY_COUNTS_FILE));
+  return sounds.map((sound) => ({ ...sound, playedBy: counts[sound.filename] || [] }));
+};
+
 // Function to sanitize filenames
 const sanitizeFilename = (filename) => {
   return filename.trim().replace(/[^a-zA-Z0-9.-]/g, "_");
@@ -42,7 +62,7 @@ const upload = multer({ storage, limits: { fileSize: 1 * 1024 * 1024 } });
 app.get("/api/sounds", (req, res) => {
   if (fs.existsSync(SOUNDS_FILE)) {
     const sounds = JSON.parse(fs.readFileSync(SOUNDS_FILE));
-    res.json(sounds);
+    res.json(withPlayCounts(sounds));
   } else {
     res.json([]);
   }
@@ -107,7 +127,7 @@ app.post("/api/sounds/upload", upload.single("audio"), (req, res) => {
   };
   sounds.push(newSound);
 
-  fs.writeFileSync(SOUNDS_FILE, JSON.stringify(sounds, null, 2));
+  writeJsonFile(SOUNDS_FILE, sounds);
 
   res.json({ message: "File uploaded successfully", sound: newSound });
 });
@@ -141,7 +161,7 @@ app.delete("/api/sounds/:filename", (req, res) => {
   }
 
   sounds.splice(soundIndex, 1);
-  fs.writeFileSync(SOUNDS_FILE, JSON.stringify(sounds, null, 2));
+  writeJsonFile(SOUNDS_FILE, sounds);
 
   const soundPath = path.join(SOUND_DIR, filename);
   if (fs.existsSync(soundPath)) {
@@ -191,7 +211,7 @@ app.put("/api/sounds/:filename", upload.none(), (req, res) => {
     sound.category = category;
   }
 
-  fs.writeFileSync(SOUNDS_FILE, JSON.stringify(sounds, null, 2));
+  writeJsonFile(SOUNDS_FILE, sounds);
 
   res.json({ message: "Sound updated successfully", sound });
 });
@@ -232,7 +252,7 @@ app.put(`/api/users/:userId/favorites/:filename`, (req, res) => {
     }
   }
 
-  fs.writeFileSync(SOUNDS_FILE, JSON.stringify(sounds, null, 2));
+  writeJsonFile(SOUNDS_FILE, sounds);
 
   res.json({ message: "Sound favorite status updated", sound });
 });
@@ -271,7 +291,7 @@ app.put(`/api/users/:userId/entrance`, (req, res) => {
     }
   }
 
-  fs.writeFileSync(USERS_FILE, JSON.stringify(users, null, 2));
+  writeJsonFile(USERS_FILE, users);
 
   res.json({ message: "Entrance sound updated", sound });
 });
@@ -298,9 +318,58 @@ app.get(`/api/users/:userId/entrance`, (req, res) => {
   res.json({ entrance_sound: user.entrance_sound });
 });
 
+// Read every event from the bot's newline-delimited JSON log segments, oldest first
+const readLogs = () => {
+  if (!fs.existsSync(LOGS_DIR)) {
+    return [];
+  }
+  const segments = fs
+    .readdirSync(LOGS_DIR)
+    .filter((name) => name.startsWith("events-") && name.endsWith(".ndjson"))
+    .sort();
+  const logs = [];
+  for (const segment of segments) {
+    const lines = fs.readFileSync(path.join(LOGS_DIR, segment), "utf8").split("\n");
+    for (const line of lines) {
+      if (line.trim()) {
+        logs.push(JSON.parse(line));
+      }
+    }
+  }
+  return logs;
+};
+
+// Filtered, paginated reads go through the bot's indexed log query instead of loading
+// every segment, e.g. /api/logs?since=1700000000&event=PLAYED_SOUND&limit=100
+const LOG_QUERY_PARAMS = ["since", "until", "event", "user", "channel", "cursor", "limit"];
+
+const queryLogs = (query, callback) => {
+  const args = [LOG_QUERY, "--logs", LOGS_DIR];
+  for (const param of LOG_QUERY_PARAMS) {
+    const values = [].concat(query[param] ?? []);
+    for (const value of values) {
+      args.push(`--${param}`, String(value));
+    }
+  }
+  execFile("python3", args, { maxBuffer: 64 * 1024 * 1024 }, (error, stdout) => {
+    if (error) {
+      return callback(error);
+    }
+    callback(null, JSON.parse(stdout));
+  });
+};
+
 app.get("/api/logs", (req, res) => {
-  const logs = JSON.parse(fs.readFileSync(LOGS_FILE));
-  res.json(logs);
+  if (!LOG_QUERY_PARAMS.some((param) => param in req.query)) {
+    return res.json(readLogs());
+  }
+  queryLogs(req.query, (error, page) => {
+    if (error) {
+      console.error("Error querying logs:", error);
+      return res.status(400).json({ message: "Invalid log query" });
+    }
+    res.json(page);
+  });
 });
 
 // Start Server
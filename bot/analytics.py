@@ -0,0 +1,161 @@
+import threading
+import time
+from array import array
+from collections import Counter
+
+NO_ID = -1
+
+
+class EventAnalytics:
+    """Column-oriented copy of the event log with running rollups.
+
+    Every event is stored as one slot in a handful of typed arrays (timestamp, interned
+    event code, user id, channel id, interned sound) instead of a dict per event. The
+    rollups below are updated as each event is ingested, so queries never rescan history:
+
+    - time in voice per user, from a join/leave session state machine
+    - time streaming per user
+    - plays per sound, per user and per sound for each user
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timestamps = array('q')
+        self.events = array('B')
+        self.users = array('q')
+        self.channels = array('q')
+        self.sounds = array('l')
+        self.event_names = []
+        self._event_codes = {}
+        self.sound_names = []
+        self._sound_codes = {}
+        self.user_names = {}
+        self.channel_names = {}
+
+        self.voice_seconds = Counter()
+        self.stream_seconds = Counter()
+        self.sound_plays = Counter()
+        self.user_plays = Counter()
+        self.user_sound_plays = {}
+        self._in_voice = {}
+        self._streaming = {}
+
+        self._loading = False
+        self._pending = []
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def memory_bytes(self):
+        columns = (self.timestamps, self.events, self.users, self.channels, self.sounds)
+        return sum(column.itemsize * len(column) for column in columns)
+
+    def _intern(self, codes, names, name):
+        code = codes.get(name)
+        if code is None:
+            code = len(names)
+            codes[name] = code
+            names.append(name)
+        return code
+
+    def load(self, event_log):
+        """Ingest the existing log, then keep up with new appends (blocking, run off the loop)."""
+        with self._lock:
+            self._loading = True
+        snapshot = event_log.subscribe(self.ingest)
+        for entry in event_log.read_snapshot(snapshot):
+            with self._lock:
+                self._ingest(entry)
+        with self._lock:
+            for entry in self._pending:
+                self._ingest(entry)
+            self._pending = []
+            self._loading = False
+
+    def ingest(self, entry):
+        with self._lock:
+            if self._loading:
+                self._pending.append(entry)
+            else:
+                self._ingest(entry)
+
+    def _ingest(self, entry):
+        event = entry.get("event")
+        ts = int(entry.get("timestamp", 0))
+        user = entry.get("user") or {}
+        channel = entry.get("channel") or {}
+        sound = entry.get("sound")
+        user_id = int(user.get("id", NO_ID))
+        channel_id = int(channel.get("id", NO_ID))
+        if user_id != NO_ID:
+            self.user_names[user_id] = user.get("nick") or user.get("name")
+        if channel_id != NO_ID:
+            self.channel_names[channel_id] = channel.get("name")
+        sound_code = self._intern(self._sound_codes, self.sound_names, sound["filename"]) if sound else NO_ID
+
+        self.timestamps.append(ts)
+        self.events.append(self._intern(self._event_codes, self.event_names, event))
+        self.users.append(user_id)
+        self.channels.append(channel_id)
+        self.sounds.append(sound_code)
+
+        if event in ("JOINED_CHANNEL", "MOVED_CHANNEL", "PLAYED_SOUND", "VOICE_STATE_CHANGED"):
+            self._in_voice.setdefault(user_id, ts)
+        elif event == "LEFT_CHANNEL":
+            self._close(self._in_voice, self.voice_seconds, user_id, ts)
+            self._close(self._streaming, self.stream_seconds, user_id, ts)
+        elif event == "STARTED_STREAMING":
+            self._in_voice.setdefault(user_id, ts)
+            self._streaming.setdefault(user_id, ts)
+        elif event == "STOPPED_STREAMING":
+            self._close(self._streaming, self.stream_seconds, user_id, ts)
+        elif event == "BOT_DOWN":
+            # nothing is known while the bot was down, so every open session ends here
+            for open_sessions, totals in ((self._in_voice, self.voice_seconds), (self._streaming, self.stream_seconds)):
+                for open_user in list(open_sessions):
+                    self._close(open_sessions, totals, open_user, ts)
+
+        if event == "PLAYED_SOUND" and sound_code != NO_ID:
+            self.sound_plays[sound_code] += 1
+            self.user_plays[user_id] += 1
+            self.user_sound_plays.setdefault(user_id, Counter())[sound_code] += 1
+
+    def _close(self, open_sessions, totals, user_id, ts):
+        start = open_sessions.pop(user_id, None)
+        if start is not None and ts > start:
+            totals[user_id] += ts - start
+
+    def _with_open(self, open_sessions, totals, now):
+        result = Counter(totals)
+        for user_id, start in open_sessions.items():
+            if now > start:
+                result[user_id] += now - start
+        return result
+
+    def voice_time(self, now=None):
+        """Seconds in voice per user id, counting sessions that are still open."""
+        with self._lock:
+            return self._with_open(self._in_voice, self.voice_seconds, now or int(time.time()))
+
+    def stream_time(self, now=None):
+        with self._lock:
+            return self._with_open(self._streaming, self.stream_seconds, now or int(time.time()))
+
+    def top_sounds(self, n=10, user_id=None):
+        """[(filename, plays)] for the most played sounds, overall or for one user."""
+        with self._lock:
+            if user_id is None:
+                top = self.sound_plays.most_common(n)
+            else:
+                top = self.user_sound_plays.get(user_id, Counter()).most_common(n)
+            return [(self.sound_names[code], plays) for code, plays in top]
+
+    def top_players(self, n=10):
+        with self._lock:
+            return self.user_plays.most_common(n)
+
+
+def format_duration(seconds):
+    hours, rest = divmod(int(seconds), 3600)
+    minutes = rest // 60
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m"
@@ -0,0 +1,147 @@
+"""Simulation of LoL polling: fixed interval versus the adaptive poll scheduler.
+
+Generates a week of matches for a mix of active, casual and inactive players and
+replays it against both policies with simulated time. It reports the polls (each one
+a match-ids request to Riot) per account per day, and how long after a match ended
+the poll that picked it up came, i.e. how late the streak nickname updates. The
+first ``--warmup`` days are simulated but not counted, so the adaptive scheduler
+starts from the history it would have in production rather than from nothing.
+
+    python benchmarks/bench_lolpolls.py --accounts 50 --days 7
+"""
+import argparse
+import bisect
+import os
+import random
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lolpolls import LolPollScheduler  # noqa: E402
+
+DAY = 24 * 60 * 60
+GAME = 30 * 60
+# chance of a session on any given day, and how many games a session has
+PROFILES = {"active": (0.8, (2, 6)), "casual": (0.2, (1, 3)), "inactive": (0.0, (0, 0))}
+
+
+def match_ends(profile, days, rng):
+    """Sorted end times of one player's matches over ``days`` days."""
+    chance, (low, high) = PROFILES[profile]
+    ends = []
+    for day in range(days):
+        if rng.random() >= chance:
+            continue
+        # sessions start somewhere between 16:00 and 22:00
+        t = day * DAY + rng.uniform(16, 22) * 3600
+        for _ in range(rng.randint(low, high)):
+            # a game plus a few minutes in the lobby between games
+            t += GAME + rng.uniform(0, 600)
+            ends.append(t)
+    return ends
+
+
+def detection_delays(polls, ends, within=None, since=0.0):
+    """Time from each match end (after ``since``) to the next poll. With ``within``, only for
+    matches that ended at most ``within`` seconds after the previous one (later games of a
+    session)."""
+    delays = []
+    for j, end in enumerate(ends):
+        if end < since:
+            continue
+        if within is not None and (j == 0 or end - ends[j - 1] > within):
+            continue
+        i = bisect.bisect_right(polls, end)
+        if i < len(polls):
+            delays.append(polls[i] - end)
+    return delays
+
+
+def fixed_polls(interval, horizon, rng):
+    t = rng.uniform(0, interval)
+    polls = []
+    while t < horizon:
+        polls.append(t)
+        t += interval
+    return polls
+
+
+def adaptive_polls(scheduler, key, ends, horizon, rng):
+    t = rng.uniform(0, scheduler.min_interval)
+    last = 0.0
+    polls = []
+    while t < horizon:
+        polls.append(t)
+        # a poll sees a new match when one ended since the previous poll
+        i = bisect.bisect_right(ends, last)
+        new_match = i < len(ends) and ends[i] <= t
+        last = t
+        t += scheduler.record(key, new_match, now=t)
+    return polls
+
+
+def summarize(name, polls_per_day, delays):
+    delays = np.array(delays) / 60 if delays else np.zeros(1)
+    print(
+        f"{name:<10} {polls_per_day:>13.1f} {np.percentile(delays, 50):>10.1f} "
+        f"{np.percentile(delays, 90):>10.1f} {delays.max():>10.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--warmup", type=int, default=2, help="days simulated before measuring")
+    parser.add_argument("--mix", type=float, nargs=3, default=[0.3, 0.3, 0.4], metavar=("ACTIVE", "CASUAL", "INACTIVE"))
+    parser.add_argument("--fixed-interval", type=float, default=300, help="the old fixed poll interval")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    profiles = rng.choices(list(PROFILES), weights=args.mix, k=args.accounts)
+    scheduler = LolPollScheduler(
+        None, os.path.join(tempfile.mkdtemp(prefix="bench_lolpolls_"), "lolPolls.json"), rng=rng
+    )
+    since = args.warmup * DAY
+    horizon = (args.warmup + args.days) * DAY
+    results = {"fixed": ([], []), "adaptive": ([], [])}
+    in_session = {"fixed": ([], []), "adaptive": ([], [])}
+    by_profile = {profile: ([], []) for profile in PROFILES}
+    for key, profile in enumerate(profiles):
+        ends = match_ends(profile, args.warmup + args.days, rng)
+        fixed = fixed_polls(args.fixed_interval, horizon, rng)
+        adaptive = adaptive_polls(scheduler, str(key), ends, horizon, rng)
+        for name, polls in (("fixed", fixed), ("adaptive", adaptive)):
+            counted = len(polls) - bisect.bisect_left(polls, since)
+            results[name][0].append(counted)
+            results[name][1].extend(detection_delays(polls, ends, since=since))
+            in_session[name][0].append(counted)
+            in_session[name][1].extend(
+                detection_delays(polls, ends, within=scheduler.session_window, since=since)
+            )
+        by_profile[profile][0].append(len(adaptive) - bisect.bisect_left(adaptive, since))
+        by_profile[profile][1].extend(detection_delays(adaptive, ends, since=since))
+
+    counts = {profile: profiles.count(profile) for profile in PROFILES}
+    print(f"{args.accounts} accounts over {args.days} days: {counts}")
+    print(f"{'policy':<10} {'polls/acct/day':>13} {'p50 min':>10} {'p90 min':>10} {'max min':>10}")
+    for name, (polls, delays) in results.items():
+        summarize(name, sum(polls) / len(polls) / args.days, delays)
+    print("games ending soon after the previous one (the ones that extend a streak):")
+    for name, (polls, delays) in in_session.items():
+        summarize(name, sum(polls) / len(polls) / args.days, delays)
+    print("adaptive by player profile:")
+    for profile, (polls, delays) in by_profile.items():
+        if polls:
+            summarize(profile, sum(polls) / len(polls) / args.days, delays)
+    fixed_total = sum(results["fixed"][0]) / args.days
+    adaptive_total = sum(results["adaptive"][0]) / args.days
+    print(f"match-ids requests per day: {fixed_total:.0f} fixed, {adaptive_total:.0f} adaptive")
+
+
+if __name__ == "__main__":
+    main()
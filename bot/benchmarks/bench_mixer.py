@@ -0,0 +1,118 @@
+"""Micro-benchmark for the mixer.
+
+Mixes N looping voices (with and without gain) and reports per-frame cost against
+discord.py's 20 ms frame budget. ``pcm`` voices are raw PCM frames, which only times
+the summing. ``opus`` voices are Opus packets like the ones from the Opus cache, and
+their frame cost includes decoding every track and encoding the mix, as the voice
+client does for a PCM frame; a single voice at unity gain is passed through. The
+``opus`` runs need libopus and are skipped when it can't be loaded.
+
+    python benchmarks/bench_mixer.py --voices 8 16 --frames 5000 --sources pcm opus
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import discord  # noqa: E402
+from mixer import FRAME_BYTES, Mixer  # noqa: E402
+
+FRAME_BUDGET_MS = 20.0
+
+
+class LoopingPCM(discord.AudioSource):
+    def __init__(self, frame):
+        self.frame = frame
+
+    def read(self):
+        return self.frame
+
+
+class LoopingOpus(discord.AudioSource):
+    def __init__(self, packets):
+        self.packets = packets
+        self.index = 0
+
+    def read(self):
+        packet = self.packets[self.index]
+        self.index = (self.index + 1) % len(self.packets)
+        return packet
+
+    def is_opus(self):
+        return True
+
+
+def opus_available():
+    if not discord.opus.is_loaded():
+        try:
+            discord.opus._load_default()
+        except Exception:
+            pass
+    return discord.opus.is_loaded()
+
+
+def noise(rng, count):
+    # band-limited noise, plain white noise is an unrealistically hard case for the encoder
+    samples = rng.normal(0, 6000, count * FRAME_BYTES // 2)
+    samples = np.convolve(samples, np.ones(8) / 8, mode="same")
+    return np.clip(samples, -32768, 32767).astype(np.int16).reshape(count, -1)
+
+
+def run(voices, frames, gain, kind="pcm"):
+    rng = np.random.default_rng(0)
+    mixer = Mixer(max_voices=voices)
+    encoder = None
+    for _ in range(voices):
+        if kind == "opus":
+            encoder = encoder or discord.opus.Encoder()
+            packets = [encoder.encode(frame.tobytes(), encoder.SAMPLES_PER_FRAME) for frame in noise(rng, 50)]
+            mixer.add(LoopingOpus(packets), gain=gain)
+        else:
+            frame = rng.integers(-20000, 20000, FRAME_BYTES // 2, dtype=np.int16).tobytes()
+            mixer.add(LoopingPCM(frame), gain=gain)
+    timings = np.empty(frames)
+    for i in range(frames):
+        start = time.perf_counter()
+        data = mixer.read()
+        if encoder is not None and not mixer.is_opus():
+            # what AudioPlayer does with a PCM frame before sending it
+            encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+        timings[i] = time.perf_counter() - start
+    timings *= 1000
+    return np.mean(timings), np.percentile(timings, 50), np.percentile(timings, 99), np.max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--voices", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--frames", type=int, default=5000)
+    parser.add_argument("--sources", nargs="+", choices=("pcm", "opus"), default=["pcm", "opus"])
+    args = parser.parse_args()
+
+    kinds = list(args.sources)
+    if "opus" in kinds and not opus_available():
+        print("SKIP opus: libopus could not be loaded, so decode and encode are not measured")
+        kinds.remove("opus")
+    print(f"{'source':>6} {'voices':>6} {'gain':>5} {'mean ms':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'% budget':>9}")
+    worst = 0.0
+    for kind in kinds:
+        for voices in args.voices:
+            for gain in (1.0, 0.5):
+                mean, p50, p99, peak = run(voices, args.frames, gain, kind)
+                worst = max(worst, p99)
+                print(
+                    f"{kind:>6} {voices:>6} {gain:>5} {mean:>9.4f} {p50:>8.4f} {p99:>8.4f} {peak:>8.4f}"
+                    f" {100 * p99 / FRAME_BUDGET_MS:>8.2f}%"
+                )
+    if worst >= FRAME_BUDGET_MS:
+        print(f"FAIL: p99 frame cost {worst:.3f} ms exceeds the {FRAME_BUDGET_MS} ms budget")
+        sys.exit(1)
+    print(f"OK: worst p99 frame cost {worst:.3f} ms, budget {FRAME_BUDGET_MS} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,524 @@
+"""Load-replay benchmark driving the bot's real handlers offline.
+
+Builds fixtures (sounds.json, users.json, lolUsers.json and an event log), fakes the
+guild, members, voice client and interactions (see fakes.py), points the League poller
+at a local mock Riot server (see mockriot.py) and replays traffic through:
+
+    voice       on_voice_state_update and the voice event pipeline behind it
+    buttons     soundboard button callbacks, plus click to mixer hand-off
+    cold_command  /sound force with the bot out of voice, so every one has to connect
+    play_sound  play_sound, plus call to mixer hand-off
+    update_log  updateLog appends to the event log
+    log_query   "last hour" queries against the generated history
+    lol         polls of every LoL account against the mock Riot server
+
+Each scenario reports throughput, p50/p99 latency and peak RSS. Results are saved as JSON
+in --results-dir and compared against the newest earlier run (or --compare FILE).
+
+    python benchmarks/bench_replay.py --sounds 10000 --logs 1000000
+    python benchmarks/bench_replay.py --scenarios voice buttons --events 5000 --rate 200
+    python benchmarks/bench_replay.py --scenarios voice --trace path/to/events-000001.ndjson
+"""
+import argparse
+import asyncio
+import contextlib
+import glob
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# fixtures puts bot/ on sys.path, so it goes before the modules importing bot code
+from fixtures import (  # noqa: E402
+    load_bot, write_lol_users, write_logs, write_sounds, write_users,
+)
+from fakes import FakeChannel, FakeGuild, FakeInteraction, FakeOpusCache, FakeVoiceState, install, settle  # noqa: E402
+from mockriot import MockRiotServer  # noqa: E402
+
+GUILD_ID = 476435508638253056
+SCENARIOS = ["voice", "buttons", "cold_command", "play_sound", "update_log", "log_query", "lol"]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Recorder:
+    """Latency samples for one measured operation."""
+
+    def __init__(self):
+        self.samples = []
+        self.start = time.perf_counter()
+        self.end = None
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def stop(self):
+        self.end = time.perf_counter()
+
+    def summary(self):
+        elapsed = (self.end or time.perf_counter()) - self.start
+        samples = np.array(self.samples) * 1000 if self.samples else np.zeros(1)
+        return {
+            "ops": len(self.samples),
+            "seconds": round(elapsed, 3),
+            "ops_per_sec": round(len(self.samples) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(float(np.percentile(samples, 50)), 4),
+            "p99_ms": round(float(np.percentile(samples, 99)), 4),
+            "max_ms": round(float(samples.max()), 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+
+async def paced(count, rate):
+    """Yield 0..count-1, spaced to ``rate`` per second (as fast as possible when 0)."""
+    start = time.perf_counter()
+    for i in range(count):
+        if rate:
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif i % 64 == 0:
+            # let the pipeline workers and voice sessions run between bursts
+            await asyncio.sleep(0)
+        yield i
+
+
+def synthetic_trace(count, members, channels, seed=0):
+    """[(member id, {attribute: value})] for a random walk of joins, moves, toggles and leaves."""
+    rng = random.Random(seed)
+    where = {}
+    trace = []
+    for _ in range(count):
+        member = rng.randrange(members)
+        if member not in where:
+            where[member] = rng.randrange(channels)
+            trace.append((member, {"channel": 100 + where[member]}))
+            continue
+        roll = rng.random()
+        if roll < 0.2:
+            del where[member]
+            trace.append((member, {"channel": None, "self_stream": False}))
+        elif roll < 0.35:
+            where[member] = rng.randrange(channels)
+            trace.append((member, {"channel": 100 + where[member]}))
+        elif roll < 0.65:
+            trace.append((member, {"self_mute": "toggle"}))
+        elif roll < 0.8:
+            trace.append((member, {"self_deaf": "toggle"}))
+        else:
+            trace.append((member, {"self_stream": "toggle"}))
+    return trace
+
+
+def recorded_trace(path, limit=None):
+    """The same shape as synthetic_trace, read from an event log segment."""
+    trace = []
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            event = entry.get("event")
+            user = (entry.get("user") or {}).get("id")
+            channel = (entry.get("channel") or {}).get("id")
+            voice = entry.get("voiceState") or {}
+            if event in ("JOINED_CHANNEL", "MOVED_CHANNEL"):
+                changes = {"channel": channel}
+            elif event == "LEFT_CHANNEL":
+                changes = {"channel": None, "self_stream": False}
+            elif event == "STARTED_STREAMING":
+                changes = {"self_stream": True}
+            elif event == "STOPPED_STREAMING":
+                changes = {"self_stream": False}
+            elif event == "VOICE_STATE_CHANGED":
+                changes = {"self_mute": voice.get("muted", False), "self_deaf": voice.get("deafened", False)}
+            else:
+                continue
+            trace.append((user, changes))
+            if limit and len(trace) >= limit:
+                break
+    return trace
+
+
+class Harness:
+    def __init__(self, bot, guild, args):
+        self.bot = bot
+        self.guild = guild
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.results = {}
+
+    def member(self, member_id):
+        return self.guild.get_member(member_id) or self.guild.add_member(member_id)
+
+    def channel(self, channel_id):
+        for channel in self.guild.channels:
+            if channel.id == channel_id:
+                return channel
+        return self.guild.add_channel(channel_id)
+
+    def move(self, member, changes):
+        """Apply a trace step to ``member`` and return the (before, after) voice states."""
+        before = member.voice or FakeVoiceState()
+        values = {}
+        for name, value in changes.items():
+            if name == "channel":
+                value = self.channel(value) if value is not None else None
+            elif value == "toggle":
+                value = not getattr(before, name)
+            values[name] = value
+        after = before.replace(**values)
+        if before.channel is not after.channel:
+            if before.channel is not None and member in before.channel.members:
+                before.channel.members.remove(member)
+            if after.channel is not None:
+                after.channel.members.append(member)
+        member.voice = after if after.channel is not None else None
+        return before, after
+
+    async def ensure_listener(self):
+        """Put a member in a channel with the bot so soundboard clicks have somewhere to play."""
+        member = self.member(self.args.users + 1)
+        if member.voice is None:
+            self.move(member, {"channel": 100})
+        await self.bot.voice_sessions.connect(member.voice.channel)
+        return member
+
+    def timed_prepare(self, requested, recorder):
+        """Wrap prepare_sound to record how long each request took to reach the mixer."""
+        original = self.bot.prepare_sound
+
+        def prepare(sound, member=None):
+            result = original(sound, member)
+            requested_at = requested.pop(sound, None)
+            if requested_at is not None:
+                recorder.record(time.perf_counter() - requested_at)
+            return result
+
+        self.bot.prepare_sound = prepare
+        return original
+
+    async def voice(self):
+        args = self.args
+        if args.trace:
+            trace = recorded_trace(args.trace, args.events)
+        else:
+            trace = synthetic_trace(args.events, args.users, args.channels, args.seed)
+        pipeline = self.bot.voice_events
+        pipeline.coalesce_seconds = args.coalesce
+        submit = Recorder()
+        handled = Recorder()
+        inflight = [0]
+
+        def timed(handler):
+            async def wrapper(event):
+                inflight[0] += 1
+                try:
+                    await handler(event)
+                finally:
+                    inflight[0] -= 1
+                    handled.record(time.time() - event.timestamp)
+            wrapper.__name__ = handler.__name__
+            return wrapper
+
+        if not pipeline._workers:
+            pipeline.handlers = [timed(handler) for handler in pipeline.handlers]
+        # entrance sounds report join-to-audio through the bound histograms they're given
+        join_to_audio = {"connect": Recorder(), "connected": Recorder()}
+        histogram = self.bot.JOIN_TO_AUDIO_SECONDS
+        self.bot.JOIN_TO_AUDIO_SECONDS = types.SimpleNamespace(
+            bind=lambda path: types.SimpleNamespace(observe=join_to_audio[path].record)
+        )
+        async for i in paced(len(trace), args.rate):
+            member_id, changes = trace[i]
+            member = self.member(member_id)
+            before, after = self.move(member, changes)
+            start = time.perf_counter()
+            await self.bot.on_voice_state_update(member, before, after)
+            submit.record(time.perf_counter() - start)
+        submit.stop()
+        await settle(lambda: pipeline.pending() == 0 and inflight[0] == 0)
+        handled.stop()
+        self.bot.JOIN_TO_AUDIO_SECONDS = histogram
+        self.results["voice.submit"] = submit.summary()
+        self.results["voice.handled"] = handled.summary()
+        for path, recorder in join_to_audio.items():
+            recorder.stop()
+            self.results[f"voice.entrance.{path}"] = recorder.summary()
+
+    async def buttons(self):
+        member = await self.ensure_listener()
+        session = self.bot.voice_sessions.get(self.guild.id)
+        pages = (len(self.bot.sound_catalog.all()) + 11) // 12
+        clicks = Recorder()
+        handoff = Recorder()
+        requested = {}
+        original = self.timed_prepare(requested, handoff)
+        try:
+            async for _ in paced(self.args.events, self.args.rate):
+                view = self.bot.get_page_view("all", self.rng.randrange(pages))
+                button = self.rng.choice([item for item in view.children if item.row < 4])
+                interaction = FakeInteraction(member, self.guild)
+                start = time.perf_counter()
+                requested.setdefault(view.sounds[view.children.index(button) + view.page * 12]["filename"], start)
+                await button.callback(interaction)
+                clicks.record(time.perf_counter() - start)
+            clicks.stop()
+            await settle(lambda: not self.bot.background_tasks and session.pending() == 0)
+            handoff.stop()
+        finally:
+            self.bot.prepare_sound = original
+        self.results["buttons.click"] = clicks.summary()
+        self.results["buttons.handoff"] = handoff.summary()
+
+    async def cold_command(self):
+        member = await self.ensure_listener()
+        command = self.bot.sound.callback
+        acks = Recorder()
+        replies = Recorder()
+        async for _ in paced(max(1, self.args.events // 10), self.args.rate):
+            await self.bot.voice_sessions.disconnect(self.guild.id)
+            interaction = FakeInteraction(member, self.guild)
+            start = time.perf_counter()
+            await command(interaction)
+            acks.record(time.perf_counter() - start)
+            await settle(lambda: "edit_original_response" in interaction.followup.calls)
+            replies.record(time.perf_counter() - start)
+        acks.stop()
+        replies.stop()
+        # what is left are the replies waiting to delete themselves
+        for task in list(self.bot.background_tasks):
+            task.cancel()
+        self.results["cold_command.ack"] = acks.summary()
+        self.results["cold_command.reply"] = replies.summary()
+
+    async def play_sound(self):
+        member = await self.ensure_listener()
+        session = self.bot.voice_sessions.get(self.guild.id)
+        sounds = self.bot.sound_catalog.all()
+        calls = Recorder()
+        handoff = Recorder()
+        requested = {}
+        original = self.timed_prepare(requested, handoff)
+        try:
+            async for i in paced(self.args.events, self.args.rate):
+                filename = sounds[i % len(sounds)]["filename"]
+                start = time.perf_counter()
+                requested.setdefault(filename, start)
+                self.bot.play_sound(filename, member)
+                calls.record(time.perf_counter() - start)
+            calls.stop()
+            await settle(lambda: session.pending() == 0)
+            handoff.stop()
+        finally:
+            self.bot.prepare_sound = original
+        self.results["play_sound.call"] = calls.summary()
+        self.results["play_sound.handoff"] = handoff.summary()
+
+    async def update_log(self):
+        member = self.member(0)
+        channel = self.channel(100)
+        joined = (FakeVoiceState(), FakeVoiceState(channel))
+        left = (FakeVoiceState(channel), FakeVoiceState())
+        member.voice = joined[1]
+        writes = Recorder()
+        async for i in paced(self.args.events, self.args.rate):
+            before, after = joined if i % 2 == 0 else left
+            start = time.perf_counter()
+            self.bot.updateLog(member, before, after)
+            writes.record(time.perf_counter() - start)
+        writes.stop()
+        self.results["update_log"] = writes.summary()
+
+    async def log_query(self):
+        query = self.bot.log_query
+        # relative to the newest entry, so reused fixtures still have a busy last hour
+        hour_ago = self.bot.event_log.last()["timestamp"] - 3600
+        index = Recorder()
+        start = time.perf_counter()
+        query.page(100, start=hour_ago)
+        index.record(time.perf_counter() - start)
+        index.stop()
+        pages = Recorder()
+        for _ in range(min(self.args.events, 500)):
+            start = time.perf_counter()
+            query.page(100, start=hour_ago)
+            pages.record(time.perf_counter() - start)
+        pages.stop()
+        self.results["log_query.first"] = index.summary()
+        self.results["log_query.hour"] = pages.summary()
+
+    async def lol(self):
+        self.bot.lol_polls.sync(self.bot.store.lol_accounts())
+        cycles = Recorder()
+        for _ in range(self.args.lol_cycles):
+            self.riot.advance()
+            start = time.perf_counter()
+            await self.bot.lol_polls.poll_all()
+            cycles.record(time.perf_counter() - start)
+        cycles.stop()
+        self.bot.lol_polls.close()
+        await self.bot.riot_client.close()
+        self.results["lol.cycle"] = cycles.summary()
+        self.results["lol.cycle"]["riot_requests"] = sum(self.riot.requests.values())
+
+
+def prepare_fixtures(workdir, args):
+    """Generate the data files, reusing them when ``workdir`` already has the same ones."""
+    params = {
+        "sounds": args.sounds, "users": args.users, "channels": args.channels,
+        "logs": args.logs, "lol_accounts": args.lol_accounts, "seed": args.seed,
+    }
+    marker = os.path.join(workdir, "fixtures.json")
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == params:
+                return False
+    os.makedirs(workdir, exist_ok=True)
+    for name in ("logs", "riotCache.db", "lolStreaks.json", "lolPolls.json", "bot.db", "bot.db-wal", "bot.db-shm", "playCounts.json"):
+        path = os.path.join(workdir, name)
+        if os.path.isdir(path):
+            for segment in glob.glob(os.path.join(path, "*")):
+                os.remove(segment)
+        elif os.path.exists(path):
+            os.remove(path)
+    sounds = write_sounds(os.path.join(workdir, "sounds.json"), args.sounds, args.users, args.seed)
+    write_users(os.path.join(workdir, "users.json"), args.users, sounds, args.seed)
+    write_lol_users(os.path.join(workdir, "lolUsers.json"), args.lol_accounts)
+    write_logs(os.path.join(workdir, "logs"), args.logs, args.users, args.channels, sounds, seed=args.seed)
+    with open(marker, "w") as f:
+        json.dump(params, f)
+    return True
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_results(results, baseline=None):
+    print(f"{'operation':<20} {'ops':>7} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'rss MB':>7}  vs baseline")
+    for name, row in results.items():
+        line = (
+            f"{name:<20} {row['ops']:>7} {row['ops_per_sec']:>10.1f} "
+            f"{row['p50_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['peak_rss_mb']:>7.0f}"
+        )
+        old = (baseline or {}).get(name)
+        if old and old["p50_ms"] and old["p99_ms"]:
+            line += (
+                f"  p50 {(row['p50_ms'] / old['p50_ms'] - 1) * 100:+.0f}%"
+                f"  p99 {(row['p99_ms'] / old['p99_ms'] - 1) * 100:+.0f}%"
+            )
+        print(line)
+
+
+async def run(args, workdir, riot):
+    bot = load_bot(workdir, LOL_API_BASE_URL=riot.url)
+    from riot import RateLimiter
+
+    if not args.riot_rate_limits:
+        # measure the bot, not Riot's development key limits
+        bot.riot_client.limiter = RateLimiter(limits=())
+        bot.lol_polls.limiter = RateLimiter(limits=())
+    bot.opus_cache = FakeOpusCache(args.frames)
+    FakeChannel.connect_latency = args.connect_latency
+    bot.import_json_files()
+
+    guild = FakeGuild(GUILD_ID, bot.bot)
+    install(bot.bot, guild)
+    for member_id in range(max(args.users, args.lol_accounts)):
+        guild.add_member(member_id)
+    for channel in range(args.channels):
+        guild.add_channel(100 + channel)
+    riot.register(user["account"] for user in bot.store.lol_accounts())
+
+    harness = Harness(bot, guild, args)
+    harness.riot = riot
+    for name in args.scenarios:
+        quiet = open(os.devnull, "w") if not args.verbose else None
+        with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+            await getattr(harness, name)()
+        if quiet:
+            quiet.close()
+    for session in list(bot.voice_sessions.sessions):
+        await bot.voice_sessions.disconnect(session)
+    bot.event_log.close()
+    return harness.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--events", type=int, default=2000, help="operations per scenario")
+    parser.add_argument("--rate", type=float, default=0, help="operations per second, 0 for as fast as possible")
+    parser.add_argument("--trace", help="replay voice events from an event log segment instead of a synthetic trace")
+    parser.add_argument("--sounds", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--channels", type=int, default=5)
+    parser.add_argument("--logs", type=int, default=1000000, help="pre-existing event log entries")
+    parser.add_argument("--lol-accounts", type=int, default=50)
+    parser.add_argument("--lol-cycles", type=int, default=5)
+    parser.add_argument("--riot-latency", type=float, default=0.02, help="mock Riot response delay in seconds")
+    parser.add_argument("--riot-errors", type=float, default=0.0, help="fraction of mock Riot responses that are 503s")
+    parser.add_argument("--riot-rate-limits", action="store_true", help="keep the client's Riot rate limits")
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="fake voice handshake delay in seconds")
+    parser.add_argument("--coalesce", type=float, default=0.0, help="voice pipeline mute/deafen coalescing window")
+    parser.add_argument("--frames", type=int, default=5, help="20 ms frames per fake sound")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="fixture directory, reused between runs with the same sizes")
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--compare", help="results file to compare against, default the newest in --results-dir")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own output")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="bench_replay_"))
+    start = time.perf_counter()
+    if prepare_fixtures(workdir, args):
+        print(f"Generated fixtures in {workdir} ({time.perf_counter() - start:.1f}s)")
+    else:
+        print(f"Reusing fixtures in {workdir}")
+
+    with MockRiotServer(latency=args.riot_latency, error_rate=args.riot_errors) as riot:
+        results = asyncio.run(run(args, workdir, riot))
+
+    baseline_path = args.compare
+    if baseline_path is None:
+        earlier = sorted(glob.glob(os.path.join(args.results_dir, "replay-*.json")))
+        baseline_path = earlier[-1] if earlier else None
+    baseline = None
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)["results"]
+        print(f"Comparing with {baseline_path}")
+    print_results(results, baseline)
+
+    if not args.no_save:
+        os.makedirs(args.results_dir, exist_ok=True)
+        path = os.path.join(args.results_dir, time.strftime("replay-%Y%m%d-%H%M%S.json"))
+        settings = {k: v for k, v in vars(args).items() if k not in ("results_dir", "compare", "no_save", "verbose")}
+        with open(path, "w") as f:
+            json.dump({"commit": git_commit(), "time": int(time.time()), "args": settings, "results": results}, f, indent=2)
+        print(f"Saved results to {path}")
+
+
+if __name__ == "__main__":
+    main()
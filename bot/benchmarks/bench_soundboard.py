@@ -0,0 +1,58 @@
+"""Benchmark for soundboard page flips.
+
+Compares building a page view from scratch (what every flip used to cost) with the
+cached page views, for libraries of increasing size.
+
+    python benchmarks/bench_soundboard.py --sizes 100 1000 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import load_bot, write_sounds  # noqa: E402
+
+
+def time_flips(flip, pages, flips, rng):
+    start = time.perf_counter()
+    for _ in range(flips):
+        flip(rng.randrange(pages))
+    return (time.perf_counter() - start) / flips * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--flips", type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_soundboard_")
+    bot = load_bot(workdir)
+    print(f"{'sounds':>7} {'pages':>6} {'rebuild us':>11} {'cached us':>10}")
+    for size in args.sizes:
+        write_sounds(os.path.join(workdir, "sounds.json"), size)
+        bot.sound_catalog.refresh(force=True)
+        pages = (size + 11) // 12
+        rng = random.Random(0)
+
+        def rebuild(page):
+            bot.Buttons(sorted(bot.sound_catalog.all(), key=lambda x: x['displayname'].lower()), page=page)
+
+        def cached(page):
+            bot.get_page_view("all", page)
+
+        # stay within the LRU so every flip is a hit
+        warm_pages = min(pages, bot.PAGE_VIEW_CACHE_SIZE)
+        for page in range(warm_pages):
+            cached(page)
+        rebuild_us = time_flips(rebuild, pages, max(50, args.flips // 20), rng)
+        cached_us = time_flips(cached, warm_pages, args.flips, rng)
+        print(f"{size:>7} {pages:>6} {rebuild_us:>11.1f} {cached_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
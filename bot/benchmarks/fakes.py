@@ -0,0 +1,254 @@
+"""Stand-ins for the discord.py objects the bot's handlers touch, so they run without a gateway.
+
+Only the attributes and methods main.py actually uses are implemented. The voice client
+drains whatever it is asked to play as fast as possible on a thread, the way
+discord.py's AudioPlayer does at 20 ms per frame, and then calls ``after``.
+"""
+import asyncio
+import itertools
+import threading
+
+import discord
+
+from mixer import FRAME_BYTES
+
+_message_ids = itertools.count(1)
+
+
+class FakeVoiceState:
+    def __init__(self, channel=None, self_mute=False, self_deaf=False, self_stream=False):
+        self.channel = channel
+        self.self_mute = self_mute
+        self.self_deaf = self_deaf
+        self.self_stream = self_stream
+
+    def replace(self, **changes):
+        state = FakeVoiceState(self.channel, self.self_mute, self.self_deaf, self.self_stream)
+        for name, value in changes.items():
+            setattr(state, name, value)
+        return state
+
+
+class FakeMember:
+    def __init__(self, id, guild, name=None):
+        self.id = id
+        self.guild = guild
+        self.name = name or f"user{id}"
+        self.nick = None
+        self.voice = None
+        self.bot = False
+        self.edits = 0
+
+    @property
+    def display_name(self):
+        return self.nick or self.name
+
+    def is_on_mobile(self):
+        return False
+
+    async def edit(self, nick=None):
+        self.nick = nick
+        self.edits += 1
+
+    def __eq__(self, other):
+        return isinstance(other, FakeMember) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeGuild:
+    def __init__(self, id, bot, name="guild"):
+        self.id = id
+        self.name = name
+        self.bot = bot
+        self.members = {}
+        self.channels = []
+        self.voice_client = None
+
+    def add_member(self, id, name=None):
+        member = FakeMember(id, self, name)
+        self.members[id] = member
+        return member
+
+    def add_channel(self, id, name=None):
+        channel = FakeChannel(id, self, name)
+        self.channels.append(channel)
+        return channel
+
+    def get_member(self, id):
+        return self.members.get(id)
+
+
+class FakeChannel:
+    # seconds the voice handshake takes, like a real connect's websocket and UDP setup
+    connect_latency = 0.0
+
+    def __init__(self, id, guild, name=None):
+        self.id = id
+        self.guild = guild
+        self.name = name or f"channel{id}"
+        self.members = []
+
+    async def connect(self):
+        if self.connect_latency:
+            await asyncio.sleep(self.connect_latency)
+        vc = FakeVoiceClient(self.guild, self)
+        self.guild.voice_client = vc
+        # bot.voice_clients reads the connection state, register there like discord.py does
+        self.guild.bot._connection._voice_clients[self.guild.id] = vc
+        self.members.append(self.guild.bot.user)
+        return vc
+
+
+class FakeVoiceClient:
+    def __init__(self, guild, channel):
+        self.guild = guild
+        self.channel = channel
+        self.connected = True
+        self.plays = 0
+        self.frames = 0
+        self._player = None
+
+    def is_connected(self):
+        return self.connected
+
+    def is_playing(self):
+        return self._player is not None and self._player.is_alive()
+
+    def play(self, source, after=None):
+        self.plays += 1
+        self._player = threading.Thread(target=self._drain, args=(source, after), daemon=True)
+        self._player.start()
+
+    def _drain(self, source, after):
+        error = None
+        try:
+            while self.connected:
+                data = source.read()
+                if not data:
+                    break
+                source.is_opus()
+                self.frames += 1
+        except Exception as e:
+            error = e
+        if after:
+            after(error)
+
+    def stop(self):
+        pass
+
+    async def move_to(self, channel):
+        if self.guild.bot.user in self.channel.members:
+            self.channel.members.remove(self.guild.bot.user)
+        self.channel = channel
+        channel.members.append(self.guild.bot.user)
+
+    async def disconnect(self, force=False):
+        self.connected = False
+        if self._player is not None:
+            # let the drain thread run its after callback while the loop is still open
+            self._player.join(1)
+        if self.guild.bot.user in self.channel.members:
+            self.channel.members.remove(self.guild.bot.user)
+        self.guild.voice_client = None
+        self.guild.bot._connection._voice_clients.pop(self.guild.id, None)
+
+
+class SilentSource(discord.AudioSource):
+    """A few frames of PCM silence, standing in for an encoded sound."""
+
+    def __init__(self, frames=5):
+        self.frames = frames
+
+    def read(self):
+        if self.frames <= 0:
+            return b""
+        self.frames -= 1
+        return bytes(FRAME_BYTES)
+
+
+class FakeOpusCache:
+    """Replaces the Opus cache so playback needs neither ffmpeg nor sound files."""
+
+    def __init__(self, frames=5):
+        self.frames = frames
+
+    def source(self, filename, gain_db=0.0):
+        return SilentSource(self.frames)
+
+    def schedule(self, filename, gain_db=0.0):
+        pass
+
+
+class FakeResponse:
+    def __init__(self):
+        self.calls = []
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def _record(self, name, **kwargs):
+        self.calls.append(name)
+        self.done = True
+
+    async def send_message(self, content=None, **kwargs):
+        await self._record("send_message")
+
+    async def edit_message(self, **kwargs):
+        await self._record("edit_message")
+
+    async def defer(self, **kwargs):
+        await self._record("defer")
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.calls = []
+
+    async def send(self, content=None, **kwargs):
+        self.calls.append("send")
+
+    async def edit_message(self, message_id, **kwargs):
+        self.calls.append("edit_message")
+
+
+class FakeMessage:
+    def __init__(self):
+        self.id = next(_message_ids)
+
+
+class FakeInteraction:
+    def __init__(self, user, guild):
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id
+        self.message = FakeMessage()
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+    async def edit_original_response(self, **kwargs):
+        self.followup.calls.append("edit_original_response")
+
+    async def delete_original_response(self):
+        self.followup.calls.append("delete_original_response")
+
+
+def install(bot, guild, user_id=999999):
+    """Make ``bot`` look logged in, with ``guild`` as the only guild it can see."""
+    bot_member = guild.add_member(user_id, "soundboard-bot")
+    bot_member.bot = True
+    bot._connection.user = bot_member
+    bot.get_guild = lambda id: guild
+    return bot_member
+
+
+async def settle(predicate, timeout=30.0, interval=0.001):
+    """Wait until ``predicate()`` is true, e.g. until every handler queue has drained."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        if loop.time() > deadline:
+            raise TimeoutError("benchmark did not settle")
+        await asyncio.sleep(interval)
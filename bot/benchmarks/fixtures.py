@@ -0,0 +1,132 @@
+"""Helpers for running bot code offline: generated data files and an importable main."""
+import importlib
+import json
+import os
+import random
+import string
+import sys
+import time
+import types
+
+BOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+if BOT_DIR not in sys.path:
+    sys.path.insert(0, BOT_DIR)
+
+
+def random_name(rng, length=12):
+    return "".join(rng.choice(string.ascii_lowercase + " ") for _ in range(length)).strip() or "x"
+
+
+def write_sounds(path, count, users=50, seed=0):
+    """Write a sounds.json with ``count`` sounds, favorites and play counts spread over ``users``."""
+    rng = random.Random(seed)
+    sounds = []
+    for i in range(count):
+        favorited = rng.sample(range(users), rng.randint(0, 3))
+        sounds.append({
+            "filename": f"sound_{i}.mp3",
+            "displayname": f"{random_name(rng)} {i}",
+            "category": "default",
+            "uploadedBy": {"id": str(rng.randrange(users)), "name": "user"},
+            "favoritedBy": [str(u) for u in favorited],
+            "playedBy": [{"id": str(u), "name": f"user{u}", "times": rng.randint(1, 20)} for u in favorited],
+        })
+    with open(path, "w") as f:
+        json.dump(sounds, f)
+    return sounds
+
+
+def write_users(path, users, sounds, seed=0):
+    """Write a users.json giving about half of ``users`` an entrance sound from ``sounds``."""
+    rng = random.Random(seed)
+    entries = [
+        {"id": str(u), "entrance_sound": rng.choice(sounds)["filename"] if rng.random() < 0.5 else None}
+        for u in range(users)
+    ]
+    with open(path, "w") as f:
+        json.dump(entries, f)
+    return entries
+
+
+def write_lol_users(path, count):
+    """Write a lolUsers.json linking ``count`` Riot accounts to discord ids 0..count-1."""
+    entries = [{"account": f"player{i}#EUW", "discord_id": str(i)} for i in range(count)]
+    with open(path, "w") as f:
+        json.dump(entries, f)
+    return entries
+
+
+LOG_EVENTS = ("JOINED_CHANNEL", "LEFT_CHANNEL", "MOVED_CHANNEL", "STARTED_STREAMING",
+              "STOPPED_STREAMING", "VOICE_STATE_CHANGED", "PLAYED_SOUND")
+
+
+def write_logs(directory, count, users=50, channels=5, sounds=None, end=None,
+               spacing=30, max_segment_bytes=16 * 1024 * 1024, seed=0):
+    """Write ``count`` synthetic events as event log segments, the newest at ``end``.
+
+    Events are ``spacing`` seconds apart on average, so a million of them cover about a year.
+    """
+    from eventlog import SEGMENT_PREFIX, SEGMENT_SUFFIX
+
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    end = int(end or time.time())
+    ts = end - count * spacing
+    segment = 1
+    f = open(os.path.join(directory, f"{SEGMENT_PREFIX}{segment:06d}{SEGMENT_SUFFIX}"), "w")
+    size = 0
+    lines = []
+    for _ in range(count):
+        ts += rng.randint(0, 2 * spacing)
+        user = rng.randrange(users)
+        channel = rng.randrange(channels)
+        event = rng.choice(LOG_EVENTS)
+        entry = {
+            "event": event,
+            "timestamp": min(ts, end),
+            "user": {"id": user, "name": f"user{user}", "nick": None, "is_on_mobile": False},
+            "voiceState": {"deafened": False, "muted": False},
+            "channel": {"id": 100 + channel, "name": f"channel{channel}"},
+        }
+        if event == "PLAYED_SOUND" and sounds:
+            sound = rng.choice(sounds)
+            entry["sound"] = {"filename": sound["filename"], "displayname": sound["displayname"]}
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= max_segment_bytes:
+            f.writelines(lines)
+            f.close()
+            segment += 1
+            f = open(os.path.join(directory, f"{SEGMENT_PREFIX}{segment:06d}{SEGMENT_SUFFIX}"), "w")
+            size = 0
+            lines = []
+    f.writelines(lines)
+    f.close()
+    return segment
+
+
+def load_bot(workdir, **settings):
+    """Import bot/main.py with a stand-in config module, using ``workdir`` for its data files.
+
+    ``settings`` become extra config values, e.g. ``LOL_API_BASE_URL``.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    for name in ("sounds.json", "users.json"):
+        if not os.path.exists(name):
+            with open(name, "w") as f:
+                json.dump([], f)
+    config = types.ModuleType("config")
+    config.TOKEN = "offline"
+    config.USER_ID = 1
+    config.WAITING_ROOM_ID = 2
+    config.OFFICE_ID = 3
+    config.OFFICE_CHANNEL_ID = 3
+    config.LOL_API_KEY = "offline"
+    for name, value in settings.items():
+        setattr(config, name, value)
+    sys.modules["config"] = config
+    if "main" in sys.modules:
+        return importlib.reload(sys.modules["main"])
+    return importlib.import_module("main")
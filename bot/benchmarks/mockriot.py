@@ -0,0 +1,107 @@
+"""A local stand-in for the three Riot API endpoints the League poller uses.
+
+Runs an aiohttp server on its own thread and event loop so it doesn't compete with the
+bot's loop for scheduling. Every account plays a new game each time ``advance`` is
+called; match outcomes are derived from the match id, so runs are reproducible.
+
+    with MockRiotServer(latency=0.02) as riot:
+        bot = load_bot(workdir, LOL_API_BASE_URL=riot.url)
+"""
+import asyncio
+import threading
+import zlib
+from collections import Counter
+
+from aiohttp import web
+
+
+class MockRiotServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.games = 10
+        self.requests = Counter()
+        self._owners = {}
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def advance(self, games=1):
+        """Give every account ``games`` new matches."""
+        self.games += games
+
+    async def _respond(self, endpoint, body):
+        self.requests[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        # deterministic failures: about error_rate of all requests answer 503
+        if self.error_rate and zlib.crc32(str(sum(self.requests.values())).encode()) % 1000 < self.error_rate * 1000:
+            return web.json_response({"status": {"status_code": 503}}, status=503, headers={"Retry-After": "0"})
+        return web.json_response(body)
+
+    async def _account(self, request):
+        name, tag = request.match_info["name"], request.match_info["tag"]
+        return await self._respond("account", {"puuid": f"puuid-{name}-{tag}", "gameName": name, "tagLine": tag})
+
+    async def _match_ids(self, request):
+        puuid = request.match_info["puuid"]
+        count = int(request.query.get("count", 20))
+        ids = [f"EUW1_{zlib.crc32(puuid.encode())}_{game}" for game in range(self.games, max(0, self.games - count), -1)]
+        return await self._respond("match_ids", ids)
+
+    async def _match(self, request):
+        match_id = request.match_info["match_id"]
+        _, player, _ = match_id.split("_")
+        # a few other players per match, the tracked account wins about half its games
+        participants = [{"puuid": f"other-{match_id}-{i}", "win": i % 2 == 0} for i in range(9)]
+        owner = self._owners.get(player)
+        if owner:
+            participants.append({"puuid": owner, "win": zlib.crc32(match_id.encode()) % 2 == 0})
+        return await self._respond("match", {"metadata": {"matchId": match_id}, "info": {"participants": participants}})
+
+    def register(self, accounts):
+        """Tell the server which ``name#tag`` accounts exist, so matches can include them."""
+        for account in accounts:
+            puuid = f"puuid-{account.replace('#', '-')}"
+            self._owners[str(zlib.crc32(puuid.encode()))] = puuid
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        app = web.Application()
+        app.router.add_get("/riot/account/v1/accounts/by-riot-id/{name}/{tag}", self._account)
+        app.router.add_get("/lol/match/v5/matches/by-puuid/{puuid}/ids", self._match_ids)
+        app.router.add_get("/lol/match/v5/matches/{match_id}", self._match)
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,81 @@
+import threading
+
+from store import file_stamp, store as default_store
+
+
+class SoundCatalog:
+    """In-memory view of the sounds in the store, reloaded only when sounds.json changes.
+
+    sounds.json is written by the web backend; a change is imported into the store first
+    and the catalog is rebuilt from there. ``refresh`` does that work and blocks, so on
+    the event loop it runs on a worker thread (see ``watch_backend_files``) while
+    lookups only ever read the last snapshot. ``version`` changes on every reload.
+    ``layout_version`` only changes when the names, order or favorites change, so
+    unrelated edits don't invalidate soundboard pages.
+    """
+
+    def __init__(self, path="sounds.json", store=None):
+        self.path = path
+        self.store = store or default_store
+        self.version = 0
+        self.layout_version = 0
+        self._layout = None
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.sounds = []
+        self.by_filename = {}
+        self.sorted = []
+        self.favorites = {}
+
+    def refresh(self, force=False):
+        """Reload the catalog if the file's mtime or size changed. Returns True on reload."""
+        stamp = file_stamp(self.path)
+        if not force and self.version and stamp == self._stamp:
+            return False
+        with self._lock:
+            if not force and self.version and stamp == self._stamp:
+                return False
+            sounds = []
+            if stamp is not None:
+                self.store.import_sounds(self.path, force=force)
+                sounds = self.store.sounds()
+            self._build(sounds)
+            self._stamp = stamp
+            self.version += 1
+        return True
+
+    def _build(self, sounds):
+        by_filename = {}
+        favorites = {}
+        for sound in sounds:
+            by_filename[sound['filename']] = sound
+        ordered = sorted(sounds, key=lambda x: x['displayname'].casefold())
+        # built from the sorted list so every favorites list is already in display order
+        for sound in ordered:
+            for user_id in sound.get('favoritedBy', []):
+                favorites.setdefault(str(user_id), []).append(sound)
+        layout = tuple(
+            (s['filename'], s['displayname'], tuple(s.get('favoritedBy', []))) for s in ordered
+        )
+        if layout != self._layout:
+            self._layout = layout
+            self.layout_version += 1
+        self.sounds = sounds
+        self.by_filename = by_filename
+        self.sorted = ordered
+        self.favorites = favorites
+
+    def all(self):
+        return self.sorted
+
+    def get(self, filename):
+        return self.by_filename.get(filename)
+
+    def favorites_of(self, user_id):
+        return self.favorites.get(str(user_id), [])
+
+    def __len__(self):
+        return len(self.sounds)
+
+
+sound_catalog = SoundCatalog()
@@ -0,0 +1,48 @@
+import hashlib
+import json
+import os
+
+
+def command_tree_hash(tree, guild=None):
+    """Stable hash of the command payloads ``tree.sync`` would upload for ``guild`` (or globally)."""
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+        key=lambda command: (command.get("type", 1), command["name"]),
+    )
+    data = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class CommandSync:
+    """Syncs the slash command tree only when it differs from what was last uploaded.
+
+    The hash of every synced scope ("global" or a guild id) is kept in ``path``, so a
+    restart or gateway resume with unchanged commands costs no REST call.
+    """
+
+    def __init__(self, path="commandSync.json"):
+        self.path = path
+        self.hashes = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.hashes = json.load(f)
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.hashes, f, indent=2)
+        os.replace(tmp, self.path)
+
+    async def sync(self, tree, guild=None, force=False):
+        """Sync globally, or to ``guild`` with the global commands copied in. Returns the
+        synced commands, or None when nothing changed."""
+        scope = str(guild.id) if guild else "global"
+        if guild:
+            tree.copy_global_to(guild=guild)
+        digest = command_tree_hash(tree, guild)
+        if not force and self.hashes.get(scope) == digest:
+            return None
+        synced = await tree.sync(guild=guild)
+        self.hashes[scope] = digest
+        self._save()
+        return synced
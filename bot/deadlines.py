@@ -0,0 +1,74 @@
+import asyncio
+import heapq
+
+
+class DeadlineScheduler:
+    """One task and one min-heap for many keyed deadlines on the event loop clock.
+
+    ``schedule(key, due)`` sets a key's next deadline, replacing any earlier one. The
+    task sleeps until the earliest deadline is due (or an earlier one is scheduled),
+    then awaits ``on_due(key, due)``; the key has no deadline while that runs, so
+    ``on_due`` usually schedules the next one itself. With nothing scheduled the task
+    just waits, no wakeups at all.
+
+    Entries are invalidated lazily: every (re)schedule or ``cancel`` bumps the key's
+    generation and heap entries carrying an older one are skipped when they reach the
+    top.
+    """
+
+    def __init__(self, on_due):
+        self.on_due = on_due
+        self._heap = []
+        self._generations = {}
+        self._wakeup = None
+        self._task = None
+
+    def schedule(self, key, due):
+        generation = self.cancel(key)
+        loop = asyncio.get_running_loop()
+        heapq.heappush(self._heap, (due, generation, key))
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        if self._heap[0][2] == key:
+            # the earliest deadline moved, the task has to recompute its sleep
+            self._wakeup.set()
+
+    def schedule_in(self, key, delay):
+        self.schedule(key, asyncio.get_running_loop().time() + delay)
+
+    def cancel(self, key):
+        """Drop the key's deadline, if any. Returns the key's new generation."""
+        generation = self._generations.get(key, 0) + 1
+        self._generations[key] = generation
+        return generation
+
+    def _stale(self, entry):
+        _, generation, key = entry
+        return self._generations.get(key) != generation
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while self._heap and self._stale(self._heap[0]):
+                heapq.heappop(self._heap)
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            due, _, key = heapq.heappop(self._heap)
+            self.cancel(key)
+            await self.on_due(key, due)
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._heap = []
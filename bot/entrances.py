@@ -0,0 +1,41 @@
+import threading
+
+from store import file_stamp, store as default_store
+
+
+class EntranceSounds:
+    """In-memory map of user id to entrance sound filename.
+
+    users.json is written by the web backend. Like the sound catalog, the map is only
+    rebuilt (through the store) when the file's mtime or size changes, on a worker
+    thread, so a lookup on the join path is a dict access.
+    """
+
+    def __init__(self, path="users.json", store=None):
+        self.path = path
+        self.store = store or default_store
+        self._stamp = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.sounds = {}
+
+    def refresh(self, force=False):
+        """Rebuild the map if users.json changed. Returns True on reload."""
+        stamp = file_stamp(self.path)
+        if not force and self._loaded and stamp == self._stamp:
+            return False
+        with self._lock:
+            if not force and self._loaded and stamp == self._stamp:
+                return False
+            if stamp is not None:
+                self.store.import_users(self.path, force=force)
+            self.sounds = self.store.entrance_sounds()
+            self._stamp = stamp
+            self._loaded = True
+        return True
+
+    def get(self, user_id):
+        return self.sounds.get(str(user_id))
+
+
+entrance_sounds = EntranceSounds()
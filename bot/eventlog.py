@@ -0,0 +1,171 @@
+import json
+import os
+import shutil
+import threading
+
+SEGMENT_PREFIX = "events-"
+SEGMENT_SUFFIX = ".ndjson"
+
+
+class EventLog:
+    """Append-only event log stored as newline-delimited JSON segments.
+
+    Each append writes one line to the newest segment; once a segment grows past
+    ``max_segment_bytes`` a new one is started. Nothing is ever rewritten.
+    """
+
+    def __init__(self, directory="logs", max_segment_bytes=16 * 1024 * 1024):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self._lock = threading.Lock()
+        self._file = None
+        self._index = 0
+        self._last = None
+        self._last_loaded = False
+        self._listeners = []
+
+    def _segment_path(self, index):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{index:06d}{SEGMENT_SUFFIX}")
+
+    def segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        return [os.path.join(self.directory, name) for name in names]
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.segments()
+        if segments:
+            name = os.path.basename(segments[-1])
+            self._index = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+        else:
+            self._index = 1
+        self._file = open(self._segment_path(self._index), 'a', encoding='utf-8')
+
+    def _roll_over(self):
+        self._file.close()
+        self._index += 1
+        self._file = open(self._segment_path(self._index), 'a', encoding='utf-8')
+
+    def append(self, entry):
+        line = json.dumps(entry, separators=(',', ':')) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._open()
+            elif self._file.tell() >= self.max_segment_bytes:
+                self._roll_over()
+            self._file.write(line)
+            self._file.flush()
+            self._last = entry
+            self._last_loaded = True
+            for listener in self._listeners:
+                listener(entry)
+
+    def last(self):
+        """Return the newest entry, reading only the tail of the newest non-empty segment."""
+        with self._lock:
+            if not self._last_loaded:
+                self._last = self._read_last()
+                self._last_loaded = True
+            return self._last
+
+    def _read_last(self):
+        for path in reversed(self.segments()):
+            line = _last_line(path)
+            if line:
+                return json.loads(line)
+        return None
+
+    def __iter__(self):
+        for path in self.segments():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def subscribe(self, listener):
+        """Call ``listener(entry)`` after every append from now on.
+
+        Returns a snapshot of the log as it was when the listener was added; reading it
+        with ``read_snapshot`` yields exactly the entries the listener will not see.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            return [(path, os.path.getsize(path)) for path in self.segments()]
+
+    def read_snapshot(self, snapshot):
+        for path, size in snapshot:
+            with open(path, 'rb') as f:
+                data = f.read(size)
+            for line in data.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def migrate(self, legacy_path="logs.json"):
+        """One-shot import of the old logs.json array. The old file is kept as logs.json.migrated.
+
+        The segments are written to a scratch directory next to ``directory`` and renamed
+        into place once complete, so a crash part way through leaves no segments behind
+        and the next start simply migrates again from the top.
+        """
+        if not os.path.exists(legacy_path) or self.segments():
+            return 0
+        with open(legacy_path, 'r') as f:
+            entries = json.load(f)
+        if not entries:
+            # a fresh install ships an empty logs.json, there is nothing to move
+            os.replace(legacy_path, legacy_path + ".migrated")
+            return 0
+        scratch = self.directory.rstrip(os.sep) + ".migrating"
+        if os.path.isdir(scratch):
+            # left over from an interrupted migration
+            shutil.rmtree(scratch)
+        os.makedirs(scratch)
+        staging = EventLog(scratch, self.max_segment_bytes)
+        for entry in entries:
+            staging.append(entry)
+        staging.close()
+        for path in staging.segments():
+            _fsync(path)
+        if os.path.isdir(self.directory):
+            # no segments in it, see above; rename needs it gone or empty
+            os.rmdir(self.directory)
+        os.replace(scratch, self.directory)
+        os.replace(legacy_path, legacy_path + ".migrated")
+        print(f"Migrated {len(entries)} log entries from {legacy_path} to {self.directory}/")
+        return len(entries)
+
+
+def _fsync(path):
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+def _last_line(path, chunk_size=4096):
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        pos = end
+        data = b""
+        while pos > 0:
+            step = min(chunk_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+            lines = data.rstrip(b"\n").split(b"\n")
+            if len(lines) > 1 or pos == 0:
+                return lines[-1].decode('utf-8').strip()
+    return None
+
+
+event_log = EventLog()
@@ -8,4 +8,27 @@ USER_ID = "insert_your_user_id_here"
 WAITING_ROOM_ID = "insert_your_waiting_room_id_here"
 OFFICE_ID = "insert_your_office_id_here"
 
-LOL_API_KEY = "insert_your_api_key_here"
\ No newline at end of file
+LOL_API_KEY = "insert_your_api_key_here"
+
+# Optional: point the League of Legends poller at another host (e.g. a local mock server)
+# LOL_API_BASE_URL = "https://europe.api.riotgames.com"
+
+# Optional: memory budget in bytes for pre-encoded sounds kept in memory
+# OPUS_CACHE_BYTES = 64 * 1024 * 1024
+
+# Optional: metrics are collected unless disabled; set a port to serve them for Prometheus
+# on http://127.0.0.1:<port>/metrics
+# METRICS_ENABLED = True
+# METRICS_PORT = 9464
+
+# Optional: LoL accounts are polled every LOL_POLL_MIN_INTERVAL seconds for 45 minutes after
+# a new match, then back off to every 5 minutes for the rest of the day, doubling with each
+# further day without a match up to LOL_POLL_MAX_INTERVAL; LOL_POLL_BUDGET caps polls
+# started per (count, seconds) window. The defaults are shown.
+# LOL_POLL_MIN_INTERVAL = 120
+# LOL_POLL_MAX_INTERVAL = 2 * 60 * 60
+# LOL_POLL_BUDGET = ((20, 60.0), (5000, 24 * 60 * 60.0))
+
+# Optional: event loop stalls longer than this many seconds are logged with the call site
+# that blocked the loop, see /debug stalls
+# WATCHDOG_THRESHOLD = 0.1
@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from bisect import bisect_left
+
+from eventlog import SEGMENT_PREFIX, SEGMENT_SUFFIX, EventLog
+
+BLOCK_ENTRIES = 128
+_TIMESTAMP = re.compile(rb'"timestamp":\s*(\d+)')
+
+
+class SegmentIndex:
+    """Sparse index of one log segment: a (byte offset, min timestamp, running max
+    timestamp) triple for every BLOCK_ENTRIES lines, plus how far the file is indexed
+    and the segment's overall min and max timestamps."""
+
+    def __init__(self, offsets=None, mins=None, maxes=None, indexed_to=0, last_max=None, count=0, first_min=None):
+        self.offsets = offsets or []
+        self.mins = mins or []
+        self.maxes = maxes or []
+        self.indexed_to = indexed_to
+        self.last_max = last_max
+        self.count = count
+        if first_min is None and self.mins:
+            # .idx files written before first_min was kept
+            first_min = min(self.mins)
+        self.first_min = first_min
+
+    def to_json(self):
+        return {
+            "offsets": self.offsets, "mins": self.mins, "maxes": self.maxes,
+            "indexed_to": self.indexed_to, "last_max": self.last_max, "count": self.count,
+            "first_min": self.first_min,
+        }
+
+    def extend(self, path):
+        """Index whatever was appended to the segment since the last call."""
+        with open(path, 'rb') as f:
+            f.seek(self.indexed_to)
+            offset = self.indexed_to
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # an append in progress, pick it up next time
+                    break
+                match = _TIMESTAMP.search(line)
+                if match:
+                    ts = int(match.group(1))
+                    if self.count % BLOCK_ENTRIES == 0:
+                        self.offsets.append(offset)
+                        self.mins.append(ts)
+                        self.maxes.append(max(ts, self.last_max) if self.last_max is not None else ts)
+                    else:
+                        self.mins[-1] = min(self.mins[-1], ts)
+                        self.maxes[-1] = max(self.maxes[-1], ts)
+                    self.last_max = self.maxes[-1]
+                    self.first_min = ts if self.first_min is None else min(self.first_min, ts)
+                    self.count += 1
+                offset += len(line)
+            self.indexed_to = offset
+
+
+class LogQuery:
+    """Time-range queries over the NDJSON event log without reading all of it.
+
+    Each segment gets a sparse SegmentIndex. Sealed segments (every one but the newest)
+    are indexed once and the index is saved next to them as ``.idx``; after that they
+    are never looked at on disk again, and their overall min and max timestamps decide
+    whether a query has to open them at all. The newest segment is indexed
+    incrementally as it grows. A query binary-searches the running max
+    timestamps to find the first block that can hold a match and stops at the first
+    block that starts after the window, so its cost depends on the window, not on the
+    size of the history.
+    """
+
+    def __init__(self, event_log):
+        self.event_log = event_log
+        self._indexes = {}
+        self._sealed = set()
+        self._lock = threading.Lock()
+
+    def _index(self, path, sealed):
+        index = self._indexes.get(path)
+        if path in self._sealed:
+            return index
+        if index is None:
+            idx_path = path[:-len(SEGMENT_SUFFIX)] + ".idx"
+            if sealed and os.path.exists(idx_path):
+                with open(idx_path, 'r') as f:
+                    index = SegmentIndex(**json.load(f))
+            else:
+                index = SegmentIndex()
+            self._indexes[path] = index
+        if not sealed or index.indexed_to < os.path.getsize(path):
+            index.extend(path)
+            if sealed:
+                idx_path = path[:-len(SEGMENT_SUFFIX)] + ".idx"
+                # a reader or a crash never sees half an index
+                tmp_path = idx_path + ".tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(index.to_json(), f)
+                os.replace(tmp_path, idx_path)
+        if sealed:
+            self._sealed.add(path)
+        return index
+
+    def warm(self):
+        """Index every segment now, so the first query doesn't have to (blocking)."""
+        return len(self._segments())
+
+    def _segments(self):
+        segments = self.event_log.segments()
+        with self._lock:
+            return [(path, self._index(path, sealed=i < len(segments) - 1)) for i, path in enumerate(segments)]
+
+    def scan(self, start=None, end=None, events=None, user_id=None, channel_id=None, cursor=None):
+        """Yield (entry, cursor) for matching entries in log order.
+
+        ``cursor`` is an opaque string; passing the one yielded with an entry resumes right
+        after that entry.
+        """
+        events = set(events) if events else None
+        resume_segment, resume_offset = parse_cursor(cursor) if cursor else (None, None)
+        # cheap substring checks on the raw line before paying for json.loads
+        user_needle = f'"id":{user_id}'.encode() if user_id is not None else None
+        channel_needle = f'"id":{channel_id}'.encode() if channel_id is not None else None
+
+        for path, index in self._segments():
+            number = segment_number(path)
+            if resume_segment is not None and number < resume_segment:
+                continue
+            if not index.offsets:
+                continue
+            if end is not None and index.first_min > end:
+                break
+            if start is not None and index.last_max < start:
+                continue
+            block = bisect_left(index.maxes, start) if start is not None else 0
+            offset = index.offsets[block] if block < len(index.offsets) else index.indexed_to
+            if resume_segment == number:
+                offset = max(offset, resume_offset)
+            next_blocks = index.offsets[block + 1:]
+            block_mins = index.mins[block + 1:]
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                while offset < index.indexed_to:
+                    # a block whose earliest entry is past the window ends the scan
+                    if end is not None and next_blocks and offset >= next_blocks[0]:
+                        if block_mins[0] > end:
+                            return
+                        next_blocks = next_blocks[1:]
+                        block_mins = block_mins[1:]
+                    line = f.readline()
+                    offset += len(line)
+                    if not line.strip():
+                        continue
+                    if user_needle is not None and user_needle not in line:
+                        continue
+                    if channel_needle is not None and channel_needle not in line:
+                        continue
+                    entry = json.loads(line)
+                    ts = entry.get("timestamp", 0)
+                    if start is not None and ts < start:
+                        continue
+                    if end is not None and ts > end:
+                        continue
+                    if events is not None and entry.get("event") not in events:
+                        continue
+                    if user_id is not None and (entry.get("user") or {}).get("id") != user_id:
+                        continue
+                    if channel_id is not None and (entry.get("channel") or {}).get("id") != channel_id:
+                        continue
+                    yield entry, make_cursor(number, offset)
+
+    def page(self, limit=20, **filters):
+        """Return (entries, next_cursor); next_cursor is None when nothing is left."""
+        entries = []
+        cursor = None
+        scan = self.scan(**filters)
+        for entry, cursor in scan:
+            entries.append(entry)
+            if len(entries) == limit:
+                break
+        else:
+            return entries, None
+        # peek so the last page doesn't hand out a cursor that leads nowhere
+        for _ in scan:
+            return entries, cursor
+        return entries, None
+
+
+def segment_number(path):
+    name = os.path.basename(path)
+    return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+def make_cursor(segment, offset):
+    return f"{segment}:{offset}"
+
+
+def parse_cursor(cursor):
+    segment, offset = cursor.split(":")
+    return int(segment), int(offset)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the bot's event log as JSON")
+    parser.add_argument("--logs", default="logs", help="event log directory")
+    parser.add_argument("--since", type=int, help="unix timestamp, inclusive")
+    parser.add_argument("--until", type=int, help="unix timestamp, inclusive")
+    parser.add_argument("--event", action="append", help="event type, may be repeated")
+    parser.add_argument("--user", type=int, help="user id")
+    parser.add_argument("--channel", type=int, help="channel id")
+    parser.add_argument("--cursor", help="cursor returned by the previous page")
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+
+    query = LogQuery(EventLog(args.logs))
+    entries, cursor = query.page(
+        args.limit, start=args.since, end=args.until, events=args.event,
+        user_id=args.user, channel_id=args.channel, cursor=args.cursor,
+    )
+    json.dump({"logs": entries, "cursor": cursor}, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
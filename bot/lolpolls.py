@@ -0,0 +1,186 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+from deadlines import DeadlineScheduler
+from riot import RateLimiter
+
+MIN_INTERVAL = 120
+# a game plus the lobby before the next one: how long a player counts as mid-session
+SESSION_WINDOW = 45 * 60
+MAX_INTERVAL = 2 * 60 * 60
+# the interval ceiling for an account whose last match was less than a day ago; it
+# doubles with every further day without one, up to MAX_INTERVAL
+RECENT_INTERVAL = 5 * 60
+DAY = 24 * 60 * 60
+BACKOFF = 1.5
+JITTER = 0.2
+# polls (not requests: a poll is one to a few Riot calls) started per (count, seconds) window
+POLL_BUDGET = ((20, 60.0), (5000, 24 * 60 * 60.0))
+
+
+class LolPollScheduler:
+    """Polls each tracked LoL account on its own adaptive schedule.
+
+    ``poll(user)`` is awaited per account and returns True when it found a new match,
+    False when nothing changed and None when it failed. After a new match the account
+    is polled every ``min_interval`` for ``session_window`` seconds, since its player
+    is probably in the next game already; after that every poll without a new match
+    multiplies the interval by ``backoff``, up to a ceiling that depends on how long
+    ago the last match was: ``recent_interval`` within a day of it, doubling for every
+    further day, and at most ``max_interval``. Someone who played yesterday is likely
+    to play again today, and their next session is caught within minutes; accounts
+    nobody has played on in a while cost a poll every couple of hours. Failures keep
+    the interval. Every delay gets +-``jitter`` so polls spread out over time instead
+    of firing in bursts, and a start-up or ``poll_soon`` spreads them over the first
+    ``min_interval`` seconds.
+
+    Like the random sound scheduler, due polls come from a DeadlineScheduler. Before
+    starting a poll it takes a token from a RateLimiter with the ``budget`` windows, so
+    polling never exceeds the budget no matter how many accounts are due. Intervals
+    and due times are kept in ``path``.
+    """
+
+    def __init__(
+        self,
+        poll,
+        path="lolPolls.json",
+        min_interval=MIN_INTERVAL,
+        session_window=SESSION_WINDOW,
+        max_interval=MAX_INTERVAL,
+        recent_interval=RECENT_INTERVAL,
+        backoff=BACKOFF,
+        jitter=JITTER,
+        budget=POLL_BUDGET,
+        rng=random,
+    ):
+        self.poll = poll
+        self.path = path
+        self.min_interval = min_interval
+        self.session_window = session_window
+        self.max_interval = max_interval
+        self.recent_interval = recent_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.rng = rng
+        self.limiter = RateLimiter(limits=budget)
+        self._lock = threading.Lock()
+        self.schedule = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.schedule = json.load(f)
+        self.accounts = {}
+        self._deadlines = DeadlineScheduler(self._due)
+        self._polling = set()
+        self._tasks = set()
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.schedule, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def sync(self, users):
+        """Track exactly ``users`` ([{"account", "discord_id"}]), keeping known schedules."""
+        users = {user["account"].casefold(): user for user in users}
+        for key in list(self.accounts):
+            if key not in users:
+                self.remove(key)
+        for user in users.values():
+            self.add(user)
+
+    def add(self, user):
+        key = user["account"].casefold()
+        known = key in self.accounts
+        self.accounts[key] = user
+        if known:
+            return
+        next_poll = self.schedule.get(key, {}).get("next_poll")
+        if next_poll is not None and next_poll > time.time():
+            delay = next_poll - time.time()
+        else:
+            delay = self.rng.uniform(0, self.min_interval)
+        self._schedule(key, delay)
+
+    def remove(self, account):
+        key = account.casefold()
+        self.accounts.pop(key, None)
+        self._deadlines.cancel(key)
+        if self.schedule.pop(key, None) is not None:
+            self.save()
+
+    def poll_soon(self):
+        """Spread a poll of every account over the next ``min_interval`` seconds."""
+        for key in self.accounts:
+            if key not in self._polling:
+                self._schedule(key, self.rng.uniform(0, self.min_interval))
+
+    def _schedule(self, key, delay):
+        self._deadlines.schedule_in(key, delay)
+
+    async def _due(self, key, due):
+        if key not in self.accounts:
+            return
+        # the account has no deadline while it is polled, its next one comes from the result
+        self._polling.add(key)
+        await self.limiter.acquire()
+        # keep a reference so the task isn't garbage collected before it finishes
+        task = asyncio.get_running_loop().create_task(self._poll(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _poll(self, key):
+        user = self.accounts.get(key)
+        result = None
+        try:
+            if user is not None:
+                result = await self.poll(user)
+        except Exception as e:
+            print(f"Error polling League of Legends account {user['account']}: {e}")
+        finally:
+            self._polling.discard(key)
+        if key in self.accounts:
+            self._schedule(key, self.record(key, result))
+            self.save()
+        return result
+
+    def record(self, key, result, now=None):
+        """Work out the account's next interval from a poll result. Returns the jittered delay."""
+        now = time.time() if now is None else now
+        state = self.schedule.get(key, {})
+        interval = state.get("interval", self.min_interval)
+        last_match = state.get("last_match")
+        if result is True:
+            interval = self.min_interval
+            last_match = now
+        elif result is False and (last_match is None or now - last_match >= self.session_window):
+            interval = min(self.ceiling(last_match, now), interval * self.backoff)
+        delay = interval * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        self.schedule[key] = {"interval": interval, "last_match": last_match, "next_poll": now + delay}
+        return delay
+
+    def ceiling(self, last_match, now):
+        """The longest interval for an account: short for players who played lately."""
+        if last_match is None:
+            return self.max_interval
+        days = int((now - last_match) // DAY)
+        return min(self.max_interval, self.recent_interval * 2 ** min(days, 16))
+
+    async def poll_all(self):
+        """Poll every account now, within the budget. Returns {account key: result}."""
+        keys = [key for key in self.accounts if key not in self._polling]
+        for key in keys:
+            self._deadlines.cancel(key)
+            self._polling.add(key)
+        polls = []
+        for key in keys:
+            await self.limiter.acquire()
+            polls.append(asyncio.create_task(self._poll(key)))
+        return dict(zip(keys, await asyncio.gather(*polls)))
+
+    def close(self):
+        self._deadlines.close()
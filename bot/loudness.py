@@ -0,0 +1,189 @@
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+SAMPLE_RATE = 48000
+TARGET_LUFS = -18.0
+MAX_TRUE_PEAK_DB = -1.0
+MIN_GAIN_DB = -20.0
+MAX_GAIN_DB = 12.0
+
+# ITU-R BS.1770 K-weighting at 48 kHz: high shelf followed by a high pass, as (b, a) biquads
+K_WEIGHTING = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285), (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0), (1.0, -1.99004745483398, 0.99007225036621)),
+)
+
+
+def decode_pcm(path, executable="ffmpeg"):
+    """Decode any file ffmpeg understands to float samples, shape (n, 2), at 48 kHz."""
+    result = subprocess.run(
+        [executable, "-v", "error", "-i", path, "-f", "s16le", "-ac", "2", "-ar", str(SAMPLE_RATE), "-"],
+        check=True, stdin=subprocess.DEVNULL, capture_output=True,
+    )
+    samples = np.frombuffer(result.stdout, dtype=np.int16).reshape(-1, 2)
+    return samples.astype(np.float64) / 32768.0
+
+
+def _k_weighting_gain(n, rate):
+    """Squared magnitude response of the K-weighting filter at the rfft bins of an n-sample signal."""
+    z = np.exp(-1j * 2 * np.pi * np.fft.rfftfreq(n, 1 / rate) / rate)
+    power = np.ones(len(z))
+    for b, a in K_WEIGHTING:
+        num = b[0] + b[1] * z + b[2] * z ** 2
+        den = a[0] + a[1] * z + a[2] * z ** 2
+        power *= np.abs(num / den) ** 2
+    return power
+
+
+def integrated_loudness(samples, rate=SAMPLE_RATE):
+    """Integrated loudness in LUFS following BS.1770 gating (400 ms blocks, 75% overlap).
+
+    The K-weighting is applied as a zero-phase filter in the frequency domain, which
+    keeps the whole measurement vectorized; block energies are unaffected by the phase.
+    """
+    n = len(samples)
+    if n == 0:
+        return float("-inf")
+    spectrum = np.fft.rfft(samples, axis=0)
+    spectrum *= np.sqrt(_k_weighting_gain(n, rate))[:, None]
+    weighted = np.fft.irfft(spectrum, n=n, axis=0)
+
+    block = int(0.4 * rate)
+    hop = int(0.1 * rate)
+    squared = np.square(weighted).sum(axis=1)
+    if n <= block:
+        energies = np.array([squared.mean()])
+    else:
+        cumulative = np.concatenate(([0.0], np.cumsum(squared)))
+        starts = np.arange(0, n - block + 1, hop)
+        energies = (cumulative[starts + block] - cumulative[starts]) / block
+
+    with np.errstate(divide="ignore"):
+        block_loudness = -0.691 + 10 * np.log10(energies)
+    gated = energies[block_loudness > -70.0]
+    if len(gated) == 0:
+        return float("-inf")
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) - 10.0
+    gated = energies[(block_loudness > -70.0) & (block_loudness > relative_gate)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def true_peak(samples, oversample=4, chunk=SAMPLE_RATE):
+    """Approximate true peak in dBTP by FFT-oversampling the signal chunk by chunk."""
+    n = len(samples)
+    if n == 0:
+        return float("-inf")
+    pad = 64
+    peak = np.abs(samples).max()
+    for start in range(0, n, chunk):
+        lo = max(0, start - pad)
+        segment = samples[lo:min(n, start + chunk + pad)]
+        m = len(segment)
+        upsampled = np.fft.irfft(np.fft.rfft(segment, axis=0), n=m * oversample, axis=0) * oversample
+        # the padding absorbs the ringing at the segment edges, so only the middle counts
+        inner = upsampled[(start - lo) * oversample:(start - lo + min(chunk, n - start)) * oversample]
+        peak = max(peak, np.abs(inner).max())
+    return float(20 * np.log10(peak)) if peak > 0 else float("-inf")
+
+
+def normalization_gain_db(lufs, peak_db, target=TARGET_LUFS):
+    if not np.isfinite(lufs):
+        return 0.0
+    gain_db = target - lufs
+    # never push the true peak above the ceiling
+    if np.isfinite(peak_db):
+        gain_db = min(gain_db, MAX_TRUE_PEAK_DB - peak_db)
+    return float(min(max(gain_db, MIN_GAIN_DB), MAX_GAIN_DB))
+
+
+def analyze_file(path, target=TARGET_LUFS):
+    samples = decode_pcm(path)
+    lufs = integrated_loudness(samples)
+    peak_db = true_peak(samples)
+    gain_db = normalization_gain_db(lufs, peak_db, target)
+    return {
+        "lufs": round(lufs, 2) if np.isfinite(lufs) else None,
+        "true_peak": round(peak_db, 2) if np.isfinite(peak_db) else None,
+        "gain_db": round(gain_db, 2),
+        "gain": round(10 ** (gain_db / 20), 4),
+    }
+
+
+class LoudnessIndex:
+    """Sidecar table of per-sound loudness and the gain that normalizes it.
+
+    Stored as JSON next to sounds.json. Each entry remembers the source file's mtime
+    and size, so ``update`` only analyzes new or changed files.
+    """
+
+    def __init__(self, sound_dir="sounds", path="loudness.json", target=TARGET_LUFS):
+        self.sound_dir = sound_dir
+        self.path = path
+        self.target = target
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+    def gain(self, filename):
+        entry = self.entries.get(filename)
+        return entry["gain"] if entry else 1.0
+
+    def has(self, filename):
+        return filename in self.entries
+
+    def gain_db(self, filename):
+        entry = self.entries.get(filename)
+        return entry["gain_db"] if entry else 0.0
+
+    def _stamp(self, filename):
+        st = os.stat(os.path.join(self.sound_dir, filename))
+        return f"{st.st_mtime_ns}-{st.st_size}"
+
+    def stale(self, filenames):
+        stale = []
+        for filename in filenames:
+            try:
+                stamp = self._stamp(filename)
+            except FileNotFoundError:
+                continue
+            entry = self.entries.get(filename)
+            if not entry or entry.get("stamp") != stamp:
+                stale.append((filename, stamp))
+        return stale
+
+    def update(self, filenames, max_workers=None):
+        """Analyze new or changed files in a process pool and drop removed ones (blocking)."""
+        with self._lock:
+            filenames = list(filenames)
+            stale = self.stale(filenames)
+            removed = set(self.entries) - set(filenames)
+            if not stale and not removed:
+                return 0
+            analyzed = 0
+            if stale:
+                paths = [os.path.join(self.sound_dir, filename) for filename, _ in stale]
+                with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                    futures = [pool.submit(analyze_file, path, self.target) for path in paths]
+                    for (filename, stamp), future in zip(stale, futures):
+                        try:
+                            entry = future.result()
+                        except Exception as e:
+                            print(f"Error analyzing loudness of {filename}: {e}")
+                            continue
+                        entry["stamp"] = stamp
+                        self.entries[filename] = entry
+                        analyzed += 1
+            for filename in removed:
+                del self.entries[filename]
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+            return analyzed
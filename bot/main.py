@@ -2,35 +2,152 @@ from typing import List
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
-import random
+import argparse
 import config
 import asyncio
-import json
-import requests
 import time
 import atexit
+import io
 import aiohttp
+from collections import OrderedDict
+from catalog import sound_catalog
+from eventlog import event_log
+from playstats import play_stats
+from store import store
+from entrances import entrance_sounds
+from riot import RiotClient, RIOT_BASE_URL, endpoint_name
+from riotcache import RiotCache
+from streaks import StreakTracker, streak_nick
+from opuscache import OpusCache, volume_filter
+from voice import VoiceSessionManager
+from loudness import LoudnessIndex
+from voiceevents import VoiceEventPipeline
+from search import SearchIndex
+from analytics import EventAnalytics, format_duration
+from logquery import LogQuery
+from commandsync import CommandSync
+from randomsounds import RandomSoundScheduler
+from soundpicker import SoundPicker, POLICIES
+from watchdog import LoopWatchdog
+from lolpolls import LolPollScheduler, MIN_INTERVAL, MAX_INTERVAL, POLL_BUDGET
+from metrics import (
+    metrics, CLICK_TO_PLAY_SECONDS, VOICE_STATE_UPDATE_SECONDS, VOICE_HANDLER_SECONDS,
+    RIOT_REQUEST_SECONDS, RIOT_REQUESTS, LOG_WRITE_SECONDS, SOUND_PREPARE_SECONDS, LOL_POLLS,
+    LOL_POLL_SECONDS, JOIN_TO_AUDIO_SECONDS, INTERACTION_ACK_SECONDS,
+)
 
-bot = commands.Bot(command_prefix="!", intents=discord.Intents.all())
-chance = 50
+class SoundBot(commands.Bot):
+    async def close(self):
+        # the Riot API session lives on the bot's loop, so it is closed before the loop is
+        await riot_client.close()
+        await super().close()
+
+
+bot = SoundBot(command_prefix="!", intents=discord.Intents.all())
+notify_channel = None
+PAGE_VIEW_CACHE_SIZE = 256
+page_views = OrderedDict()
+sound_lists = {}
+sound_index = SearchIndex()
+sound_index_version = 0
+lol_index = SearchIndex()
+lol_index_stamp = None
+event_analytics = EventAnalytics()
+analytics_loading = None
+log_query = LogQuery(event_log)
+LOGS_PAGE_SIZE = 15
+riot_client = RiotClient(
+    config.LOL_API_KEY, base_url=getattr(config, "LOL_API_BASE_URL", RIOT_BASE_URL)
+)
+riot_cache = RiotCache("riotCache.db")
+streak_tracker = StreakTracker("lolStreaks.json")
+lol_polls = LolPollScheduler(
+    lambda user: poll_lol_account(user),
+    "lolPolls.json",
+    min_interval=getattr(config, "LOL_POLL_MIN_INTERVAL", MIN_INTERVAL),
+    max_interval=getattr(config, "LOL_POLL_MAX_INTERVAL", MAX_INTERVAL),
+    budget=getattr(config, "LOL_POLL_BUDGET", POLL_BUDGET),
+)
+opus_cache = OpusCache(
+    "sounds", "opusCache", max_memory_bytes=getattr(config, "OPUS_CACHE_BYTES", 64 * 1024 * 1024)
+)
+loudness_index = LoudnessIndex("sounds", "loudness.json")
+loudness_version = 0
+metrics.enabled = getattr(config, "METRICS_ENABLED", True)
+loop_watchdog = LoopWatchdog(threshold=getattr(config, "WATCHDOG_THRESHOLD", 0.1))
+command_sync = CommandSync("commandSync.json")
+commands_synced = False
+force_command_sync = False
+command_sync_guilds = []
+sound_picker = SoundPicker(sound_catalog)
+random_sounds = RandomSoundScheduler(lambda guild_id: play_random_sound(guild_id), "randomSounds.json")
+voice_sessions = VoiceSessionManager(
+    lambda sound, member: prepare_sound(sound, member),
+    on_connect=random_sounds.activate,
+    on_disconnect=random_sounds.deactivate,
+)
+# how long a background playback waits for its sound to reach the mixer before replying anyway
+PLAYBACK_START_TIMEOUT = 10
+background_tasks = set()
 
 # EVENTS
 @bot.event
 async def on_ready():
     print(f"Logged in as {bot.user}")
+    loop_watchdog.start()
 
-    try:
-        synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} slash command(s)")
-    except Exception as e:
-        print(f"Error syncing slash commands: {e}")
+    # on_ready fires again after every reconnect, the command tree only needs one look per run
+    global commands_synced
+    if not commands_synced:
+        commands_synced = await sync_commands()
 
     await bot.change_presence(
         activity=discord.CustomActivity(name="Playing Baldur's Gate 3")
     )
 
-    if not get_lol_data.is_running():
-        get_lol_data.start()
+    # every account gets its own poll schedule, see poll_lol_account
+    lol_polls.sync(await store.call(store.lol_accounts))
+
+    if not flush_play_stats.is_running():
+        flush_play_stats.start()
+
+    if not analyze_loudness.is_running():
+        analyze_loudness.start()
+
+    if not watch_backend_files.is_running():
+        watch_backend_files.start()
+
+    metrics_port = getattr(config, "METRICS_PORT", None)
+    if metrics_port and metrics.enabled:
+        try:
+            await metrics.serve(metrics_port)
+        except OSError as e:
+            print(f"Error starting metrics endpoint on port {metrics_port}: {e}")
+
+    global analytics_loading
+    if analytics_loading is None:
+        analytics_loading = asyncio.create_task(asyncio.to_thread(event_analytics.load, event_log))
+        # index the log segments up front, /logs would otherwise pay for it on first use
+        run_in_background(asyncio.to_thread(log_query.warm))
+
+
+async def sync_commands():
+    """Upload the slash commands where they changed. Returns False if a sync failed."""
+    # guild syncs show up instantly, which is handy while developing commands
+    scopes = [discord.Object(id=guild_id) for guild_id in command_sync_guilds] or [None]
+    ok = True
+    for guild in scopes:
+        where = f"to guild {guild.id}" if guild else "globally"
+        try:
+            synced = await command_sync.sync(bot.tree, guild=guild, force=force_command_sync)
+            if synced is None:
+                print(f"Slash commands unchanged, skipped syncing {where}")
+            else:
+                print(f"Synced {len(synced)} slash command(s) {where}")
+        except Exception as e:
+            print(f"Error syncing slash commands {where}: {e}")
+            ok = False
+    return ok
 
 
 @bot.event
@@ -46,20 +163,37 @@ async def on_connect():
 
 @bot.event
 async def on_voice_state_update(member, before, after):
-    if member.id != bot.user.id:
-        updateLog(member, before, after)
+    # the work happens in the voice event pipeline's workers, see handle_voice_* below
+    start = time.perf_counter()
+    voice_events.submit(member, before, after)
+    VOICE_STATE_UPDATE_SECONDS.observe(time.perf_counter() - start)
+
+
+@VOICE_HANDLER_SECONDS.time("log")
+async def handle_voice_log(event):
+    if event.member.id != bot.user.id:
+        await asyncio.to_thread(updateLog, event.member, event.before, event.after, None, event.timestamp)
+
+
+@VOICE_HANDLER_SECONDS.time("audio")
+async def handle_voice_audio(event):
+    member, before, after = event.member, event.before, event.after
     vc = discord.utils.get(bot.voice_clients, guild=member.guild)
     if after.channel and before.channel != after.channel:
         print(f"{member.id} has joined the voice channel")
         if not vc:
-            await after.channel.connect()
-            get_entrance_sound(member)
-        if vc and vc.channel == after.channel:
-            get_entrance_sound(member)
-    
-    # Fetch the user object for your user ID
-    user = await bot.fetch_user(config.USER_ID)
+            await play_entrance_sound(member, event.timestamp, connect_to=after.channel)
+        elif vc.channel == after.channel:
+            await play_entrance_sound(member, event.timestamp)
+
+    if vc and vc.channel and len(vc.channel.members) == 1:
+        await voice_sessions.disconnect(member.guild.id)
+        print("Bot has left the voice channel as it was left alone.")
 
+
+@VOICE_HANDLER_SECONDS.time("notify")
+async def handle_voice_notify(event):
+    member, after = event.member, event.after
     # Notify you if someone joins the waiting room while you're in the office channel
     if after.channel and after.channel.id == config.WAITING_ROOM_ID:
         guild = after.channel.guild
@@ -67,13 +201,11 @@ async def on_voice_state_update(member, before, after):
 
         # Check if you are in the office channel
         if me and me.voice and me.voice.channel.id == config.OFFICE_CHANNEL_ID:
-            await user.send(f"{member.name} has joined the waiting room.")
+            channel = await get_notify_channel()
+            await channel.send(f"{member.name} has joined the waiting room.")
 
-    if vc and vc.channel and len(vc.channel.members) == 1:
-        await vc.disconnect()
-        if play_random_sounds.is_running():
-            play_random_sounds.cancel()
-        print("Bot has left the voice channel as it was left alone.")
+
+voice_events = VoiceEventPipeline([handle_voice_log, handle_voice_audio, handle_voice_notify])
 
 
 # COMMANDS
@@ -81,12 +213,10 @@ async def on_voice_state_update(member, before, after):
 async def join(interaction: discord.Interaction):
     try:
         # Connect to the voice channel of the user who sent the command
-        await interaction.user.voice.channel.connect()
+        await voice_sessions.connect(interaction.user.voice.channel)
         await interaction.response.send_message(
             "Joined the voice channel", ephemeral=True, delete_after=10
         )
-        if not play_random_sounds.is_running():
-            play_random_sounds.start()
     except Exception as e:
         await interaction.response.send_message(
             f"Error joining voice channel: {e}", ephemeral=True, delete_after=10
@@ -97,11 +227,10 @@ async def join(interaction: discord.Interaction):
 async def leave(interaction: discord.Interaction):
     channel = interaction.user.voice.channel
     try:
-        await channel.guild.voice_client.disconnect()
+        await voice_sessions.disconnect(channel.guild.id)
         await interaction.response.send_message(
             "Left the voice channel", ephemeral=True, delete_after=10
         )
-        play_random_sounds.cancel()
     except Exception as e:
         await interaction.response.send_message(
             f"Error leaving voice channel: {e}", ephemeral=True, delete_after=10
@@ -142,55 +271,76 @@ bot.tree.add_command(sound_group)
 
 @sound_group.command(name="force", description="Play a random sound effect")
 async def sound(interaction: discord.Interaction):
+    received_at = time.perf_counter()
     print(f"{interaction.user.name} played a random sound effect")
-    vc = discord.utils.get(bot.voice_clients)
-    if not vc or not vc.is_connected() or vc.channel != interaction.user.voice.channel:
-        await interaction.user.voice.channel.connect()
-    try:
-        play_sound()
-        await interaction.response.send_message(
-            "Playing a random sound effect", ephemeral=True, delete_after=10
-        )
-    except Exception as e:
-        await interaction.response.send_message(
-            f"Error playing sound effect: {e}", ephemeral=True, delete_after=10
-        )
+    # acknowledge first, joining voice can take longer than the interaction deadline
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    INTERACTION_ACK_SECONDS.observe(time.perf_counter() - received_at, "sound_force")
+    run_in_background(reply_when_playing(interaction, None, received_at, "Playing a random sound effect"))
+
+
+def search_sounds(query):
+    # the index is rebuilt off the event loop by refresh_backend_files
+    return sound_index.search(query)
+
+
+async def sound_autocomplete(
+    interaction: discord.Interaction,
+    current: str,
+) -> List[app_commands.Choice[str]]:
+    return [
+        app_commands.Choice(name=sound_catalog.by_filename[filename]['displayname'][:100], value=filename)
+        for filename in search_sounds(current)
+    ]
 
 
-@sound_group.command(name="toggle", description="Toggle random sound effects")
+@sound_group.command(name="play", description="Play a sound effect by name")
+@app_commands.describe(name="The sound to play")
+@app_commands.autocomplete(name=sound_autocomplete)
+async def play_named_sound(interaction: discord.Interaction, name: str):
+    received_at = time.perf_counter()
+    # acknowledge before the lookup, a search may have to rebuild the index first
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    INTERACTION_ACK_SECONDS.observe(time.perf_counter() - received_at, "sound_play")
+    s = sound_catalog.get(name)
+    if not s:
+        # typed without picking a suggestion, take the best match
+        matches = search_sounds(name)
+        s = sound_catalog.get(matches[0]) if matches else None
+    if not s:
+        run_in_background(replace_response(interaction, f"No sound called `{name}`"))
+        return
+    print(f"{interaction.user.name} played {s['filename']}")
+    run_in_background(reply_when_playing(interaction, s['filename'], received_at, f"Playing `{s['displayname']}`"))
+
+
+@sound_group.command(name="toggle", description="Toggle random sound effects in this server")
 async def toggle_random_sound(interaction: discord.Interaction):
-    if play_random_sounds.is_running():
-        print("Stopping random sounds")
-        play_random_sounds.cancel()
-        await interaction.response.send_message(
-            "Random sound effects has been stopped", ephemeral=True, delete_after=10
-        )
-    else:
-        print("Starting random sounds")
-        play_random_sounds.start()
-        await interaction.response.send_message(
-            "Random sound effects has been started", ephemeral=True, delete_after=10
-        )
-    print(
-        f"Random sounds is { play_random_sounds.is_running() and 'running' or 'stopped'}"
+    enabled = not random_sounds.settings(interaction.guild_id)["enabled"]
+    random_sounds.set_enabled(interaction.guild_id, enabled)
+    print(f"Random sounds {'started' if enabled else 'stopped'} in guild {interaction.guild_id}")
+    await interaction.response.send_message(
+        f"Random sound effects has been {'started' if enabled else 'stopped'}",
+        ephemeral=True,
+        delete_after=10,
     )
 
 
 @sound_group.command(
-    name="interval", description="Set the interval for random sound effects"
+    name="interval", description="Set the interval for random sound effects in this server"
 )
 @app_commands.describe(interval="The interval in seconds")
 async def set_interval(interaction: discord.Interaction, interval: int):
     min = 5
     max = 300
     if interval >= min and interval <= max:
-        play_random_sounds.change_interval(seconds=interval)
+        random_sounds.set_interval(interaction.guild_id, interval)
         await interaction.response.send_message(
             f"Set the interval for random sound effects to {interval} seconds",
             ephemeral=True,
             delete_after=10,
         )
-        print(f"Random sounds interval: {play_random_sounds.seconds}sec")
+        print(f"Random sounds interval in guild {interaction.guild_id}: {interval}sec")
     else:
         await interaction.response.send_message(
             f"Interval must be between {min} and {max} seconds",
@@ -201,33 +351,77 @@ async def set_interval(interaction: discord.Interaction, interval: int):
 
 @sound_group.command(
     name="chance",
-    description="Set the chance for random sound effects to play on each interval",
+    description="Set the chance for random sound effects to play on each interval in this server",
 )
 @app_commands.describe(percentage="The chance as a percentage")
 async def set_chance(interaction: discord.Interaction, percentage: int):
-    global chance
     min = 1
     max = 100
     if percentage >= min and percentage <= max:
-        chance = percentage
+        random_sounds.set_chance(interaction.guild_id, percentage)
         await interaction.response.send_message(
             f"Set the chance for random sound effects to {percentage}%",
             ephemeral=True,
             delete_after=10,
         )
-        print(f"Random sounds chance: {chance}%")
+        print(f"Random sounds chance in guild {interaction.guild_id}: {percentage}%")
     else:
         await interaction.response.send_message(
-            f"Interval must be between {min} and {max} seconds",
+            f"Chance must be between {min} and {max}%",
             ephemeral=True,
             delete_after=10,
         )
 
 
+async def category_autocomplete(
+    interaction: discord.Interaction,
+    current: str,
+) -> List[app_commands.Choice[str]]:
+    categories = sorted({s['category'] for s in sound_catalog.all() if s.get('category')})
+    return [
+        app_commands.Choice(name=category, value=category)
+        for category in categories if current.casefold() in category.casefold()
+    ][:25]
+
+
+@sound_group.command(
+    name="weighting", description="Choose how random sound effects are picked in this server"
+)
+@app_commands.describe(
+    policy="uniform: every sound alike, favorites: favorited sounds more often, fresh: rarely played sounds more often",
+    category="A category to play more often",
+    boost="How many times more often the category plays",
+)
+@app_commands.choices(policy=[app_commands.Choice(name=policy, value=policy) for policy in POLICIES])
+@app_commands.autocomplete(category=category_autocomplete)
+async def set_weighting(
+    interaction: discord.Interaction,
+    policy: str,
+    category: str = None,
+    boost: float = 3.0,
+):
+    min = 0.0
+    max = 100.0
+    if not (min <= boost <= max):
+        await interaction.response.send_message(
+            f"Boost must be between {min:g} and {max:g}", ephemeral=True, delete_after=10
+        )
+        return
+    random_sounds.set_policy(interaction.guild_id, policy, category, boost if category else 1.0)
+    message = f"Random sound effects are now picked by `{policy}`"
+    if category:
+        message += f", with `{category}` {boost:g}x as likely"
+    await interaction.response.send_message(message, ephemeral=True, delete_after=10)
+    print(f"Random sounds weighting in guild {interaction.guild_id}: {policy} {category or ''}")
+
+
 class Buttons(discord.ui.View):
-    def __init__(self, sounds, page=-1, *, timeout=None):
+    def __init__(self, sounds, page=-1, *, labels=None, kind="all", user_id=None, timeout=None):
         super().__init__(timeout=timeout)
         self.sounds = sounds
+        self.labels = labels
+        self.kind = kind
+        self.user_id = user_id
         self.page = page
         self.max_per_page = 3 * 4
         if page == -1:
@@ -255,47 +449,35 @@ class Buttons(discord.ui.View):
     async def show_favorites(self, interaction: discord.Interaction):
         user_id = interaction.user.id
         try: 
-            with open('sounds.json', 'r') as f:
-                sounds = json.load(f)
-            sounds = sorted(sounds, key=lambda x: x['displayname'].lower())
-                # find the user's favorite sounds in sound.favoritedBy[]
-            favorite_sounds = [sound for sound in sounds if str(user_id) in sound.get('favoritedBy', [])]
-            if not favorite_sounds:
+            if not sound_catalog.favorites_of(user_id):
                 raise Exception("You have no favorite sounds")
+            view = get_page_view("favorites", 0, user_id)
         except Exception as e:
-                await interaction.response.edit_message(content=f"Error: {e}")
-                await asyncio.sleep(3)
-                await interaction.followup.edit_message(view=self, content="Select a category:", message_id=interaction.message.id)
-        view = Buttons(favorite_sounds, page=0)
+            await interaction.response.edit_message(content=f"Error: {e}")
+            await asyncio.sleep(3)
+            await interaction.followup.edit_message(view=self, content="Select a category:", message_id=interaction.message.id)
+            return
         await interaction.response.edit_message(view=view, content="Choose a sound to play:")
 
     async def show_all(self, interaction: discord.Interaction):
         try: 
-            with open('sounds.json', 'r') as f:
-                sounds = json.load(f)
-            sounds = sorted(sounds, key=lambda x: x['displayname'].lower())
+            view = get_page_view("all", 0)
         except Exception as e:
             await interaction.response.edit_message(content=f"Error: {e}")
             await asyncio.sleep(3)
             await interaction.followup.edit_message(view=self, content="Select a category:", message_id=interaction.message.id)
-        view = Buttons(sounds, page=0)
+            return
         await interaction.response.edit_message(view=view, content="Choose a sound to play:")
 
     def add_buttons(self):
         start = self.page * self.max_per_page
         end = start + self.max_per_page
-        max_label_length = max(
-            len(sound['displayname'])
-            for sound in self.sounds
-        )
+        labels = self.labels or padded_labels(self.sounds)
         pageTotal = (len(self.sounds) + self.max_per_page - 1) // self.max_per_page
         for index, sound in enumerate(self.sounds[start:end]):
             # every 3rd button is a new row starting at row 0
             row = index // 3
-            label = sound['displayname']
-            padded_label = label.center(
-                max_label_length, ""
-            )  # Adding spaces to both sides
+            padded_label = labels[start + index]
             button = discord.ui.Button(
                 label=padded_label,
                 style=discord.ButtonStyle.gray,
@@ -336,42 +518,274 @@ class Buttons(discord.ui.View):
 
     def create_callback(self, sound):
         async def callback(interaction: discord.Interaction):
-            try:
-                vc = discord.utils.get(bot.voice_clients)
-                if (
-                    not vc
-                    or not vc.is_connected()
-                    or vc.channel != interaction.user.voice.channel
-                ):
-                    await interaction.user.voice.channel.connect()
-                print(f"{interaction.user.name} used soundboard")
-                play_sound(sound['filename'], interaction.user)
-                await interaction.response.edit_message(view=self)
-            except Exception as e:
-                await interaction.response.edit_message(content=f"Error: {e}")
-                await asyncio.sleep(3)
-                await interaction.followup.edit_message(view=self, content="Choose a sound to play:", message_id=interaction.message.id)
+            clicked_at = time.perf_counter()
+            # acknowledge first, joining voice can take longer than the interaction deadline
+            await interaction.response.defer()
+            INTERACTION_ACK_SECONDS.observe(time.perf_counter() - clicked_at, "soundboard")
+            print(f"{interaction.user.name} used soundboard")
+            run_in_background(self.play(interaction, sound, clicked_at))
         return callback
 
+    async def play(self, interaction: discord.Interaction, sound, clicked_at):
+        message_id = interaction.message.id
+        try:
+            if not await connect_and_play(interaction.user, sound['filename'], clicked_at):
+                raise Exception("The playback queue is full, try again in a moment")
+            await interaction.followup.edit_message(
+                message_id, view=self, content=f"Choose a sound to play:\n-# Playing `{sound['displayname']}`"
+            )
+        except Exception as e:
+            await interaction.followup.edit_message(message_id, content=f"Error: {e}")
+            await asyncio.sleep(3)
+            await interaction.followup.edit_message(message_id, view=self, content="Choose a sound to play:")
+
     def create_callback_page(self, page, content = "Choose a sound to play:"):
         async def callback(interaction: discord.Interaction):
-            view = Buttons(self.sounds, page=page)
+            if page == -1:
+                view = get_page_view("front", -1)
+            else:
+                view = get_page_view(self.kind, page, self.user_id)
             await interaction.response.edit_message(view=view, content=content)
 
         return callback
 
 
+def padded_labels(sounds):
+    max_label_length = max((len(sound['displayname']) for sound in sounds), default=0)
+    return [
+        sound['displayname'].center(
+            max_label_length, ""
+        )  # Adding spaces to both sides
+        for sound in sounds
+    ]
+
+
+def get_sound_list(kind, user_id=None):
+    """The sounds and padded labels of a soundboard list, computed once per catalog layout."""
+    key = (sound_catalog.layout_version, kind, user_id)
+    cached = sound_lists.get(key)
+    if cached is None:
+        if any(k[0] != key[0] for k in sound_lists):
+            sound_lists.clear()
+        sounds = sound_catalog.favorites_of(user_id) if kind == "favorites" else sound_catalog.all()
+        cached = (sounds, padded_labels(sounds))
+        sound_lists[key] = cached
+    return cached
+
+
+def get_page_view(kind, page, user_id=None):
+    """Return the prebuilt view for a soundboard page, building it on first use."""
+    if kind != "favorites":
+        user_id = None
+    key = (sound_catalog.layout_version, kind, user_id, page)
+    view = page_views.get(key)
+    if view is not None:
+        page_views.move_to_end(key)
+        return view
+    if kind == "front":
+        view = Buttons([], page=-1)
+    else:
+        sounds, labels = get_sound_list(kind, user_id)
+        view = Buttons(sounds, page=page, labels=labels, kind=kind, user_id=user_id)
+    page_views[key] = view
+    while len(page_views) > PAGE_VIEW_CACHE_SIZE:
+        page_views.popitem(last=False)
+    return view
+
+
 @bot.tree.command(name="soundboard", description="Show the soundboard")
 async def soundboard(interaction: discord.Interaction):
-    with open('sounds.json', 'r') as f:
-        sounds = json.load(f)
-    sounds = sorted(sounds, key=lambda x: x['displayname'].lower())
-    view = Buttons(sounds)
+    view = get_page_view("front", -1)
     await interaction.response.send_message(
         "Select a category:", view=view, ephemeral=True
     )
 
 
+stats_group = discord.app_commands.Group(
+    name="stats", description="Voice and soundboard statistics"
+)
+bot.tree.add_command(stats_group)
+
+
+def stats_user_name(user_id):
+    return event_analytics.user_names.get(user_id) or str(user_id)
+
+
+@stats_group.command(name="voice", description="Time spent in voice channels")
+@app_commands.describe(user="Show the total for one user instead of the top 10")
+async def stats_voice(interaction: discord.Interaction, user: discord.Member = None):
+    totals = event_analytics.voice_time()
+    if user:
+        message = f"`{user.display_name}` has spent {format_duration(totals[user.id])} in voice."
+    else:
+        lines = [
+            f"{i}. {stats_user_name(user_id)}: {format_duration(seconds)}"
+            for i, (user_id, seconds) in enumerate(totals.most_common(10), start=1)
+        ]
+        message = "Time in voice:\n" + ("\n".join(lines) or "No voice activity logged yet.")
+    await interaction.response.send_message(message, ephemeral=True, delete_after=60)
+
+
+@stats_group.command(name="sounds", description="Most played sounds")
+@app_commands.describe(user="Show the most played sounds of one user")
+async def stats_sounds(interaction: discord.Interaction, user: discord.Member = None):
+    top = event_analytics.top_sounds(10, user.id if user else None)
+    lines = []
+    for i, (filename, plays) in enumerate(top, start=1):
+        s = sound_catalog.get(filename)
+        lines.append(f"{i}. {s['displayname'] if s else filename}: {plays}")
+    title = f"Most played by `{user.display_name}`:" if user else "Most played sounds:"
+    message = title + "\n" + ("\n".join(lines) or "No sounds played yet.")
+    await interaction.response.send_message(message, ephemeral=True, delete_after=60)
+
+
+@stats_group.command(name="players", description="Members who played the most sounds")
+async def stats_players(interaction: discord.Interaction):
+    lines = [
+        f"{i}. {stats_user_name(user_id)}: {plays}"
+        for i, (user_id, plays) in enumerate(event_analytics.top_players(10), start=1)
+    ]
+    message = "Most sounds played:\n" + ("\n".join(lines) or "No sounds played yet.")
+    await interaction.response.send_message(message, ephemeral=True, delete_after=60)
+
+
+@stats_group.command(name="streaming", description="Time spent streaming")
+async def stats_streaming(interaction: discord.Interaction):
+    totals = event_analytics.stream_time()
+    lines = [
+        f"{i}. {stats_user_name(user_id)}: {format_duration(seconds)}"
+        for i, (user_id, seconds) in enumerate(totals.most_common(10), start=1)
+    ]
+    message = "Time streaming:\n" + ("\n".join(lines) or "No streams logged yet.")
+    await interaction.response.send_message(message, ephemeral=True, delete_after=60)
+
+
+LOG_EVENTS = [
+    "JOINED_CHANNEL", "LEFT_CHANNEL", "MOVED_CHANNEL", "STARTED_STREAMING",
+    "STOPPED_STREAMING", "VOICE_STATE_CHANGED", "PLAYED_SOUND", "BOT_DOWN",
+]
+
+
+def format_log_entry(entry):
+    user = entry.get("user") or {}
+    channel = entry.get("channel") or {}
+    line = f"<t:{entry['timestamp']}:T> `{entry['event']}`"
+    if user:
+        line += f" {user.get('nick') or user.get('name')}"
+    if channel:
+        line += f" in {channel.get('name')}"
+    if entry.get("sound"):
+        line += f": {entry['sound']['displayname']}"
+    return line
+
+
+async def logs_page(filters, cursor=None):
+    entries, cursor = await asyncio.to_thread(
+        log_query.page, LOGS_PAGE_SIZE, cursor=cursor, **filters
+    )
+    message = "\n".join(format_log_entry(entry) for entry in entries) or "No matching log entries."
+    return message, cursor
+
+
+class LogsView(discord.ui.View):
+    def __init__(self, filters, cursor):
+        super().__init__(timeout=300)
+        self.filters = filters
+        self.cursor = cursor
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.primary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.defer()
+        message, self.cursor = await logs_page(self.filters, self.cursor)
+        await interaction.edit_original_response(content=message, view=self if self.cursor else None)
+
+
+@bot.tree.command(name="logs", description="Browse the event log")
+@app_commands.describe(
+    minutes="How far back to look",
+    event="Only show one kind of event",
+    user="Only show events of this member",
+    channel="Only show events in this channel",
+)
+@app_commands.choices(event=[app_commands.Choice(name=name, value=name) for name in LOG_EVENTS])
+async def logs(
+    interaction: discord.Interaction,
+    minutes: app_commands.Range[int, 1, 10080] = 60,
+    event: str = None,
+    user: discord.Member = None,
+    channel: discord.VoiceChannel = None,
+):
+    filters = {
+        "start": int(time.time()) - minutes * 60,
+        "events": [event] if event else None,
+        "user_id": user.id if user else None,
+        "channel_id": channel.id if channel else None,
+    }
+    # acknowledge first, the first query after a restart may have to index the log
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    message, cursor = await logs_page(filters)
+    if cursor:
+        await interaction.followup.send(message, view=LogsView(filters, cursor), ephemeral=True)
+    else:
+        await interaction.followup.send(message, ephemeral=True)
+
+
+debug_group = discord.app_commands.Group(
+    name="debug",
+    description="Bot internals for administrators",
+    default_permissions=discord.Permissions(administrator=True),
+)
+bot.tree.add_command(debug_group)
+
+
+def format_seconds(value):
+    if value is None:
+        return "-"
+    if value == float("inf"):
+        return "inf"
+    return f"{value * 1000:g}ms"
+
+
+@debug_group.command(name="metrics", description="Show latency and request metrics")
+async def debug_metrics(interaction: discord.Interaction):
+    if not metrics.enabled:
+        await interaction.response.send_message("Metrics are disabled.", ephemeral=True)
+        return
+    lines = []
+    for metric in metrics.metrics.values():
+        if metric.kind != "histogram":
+            continue
+        for labels in metric.series():
+            name = metric.name + (f"{{{','.join(labels)}}}" if labels else "")
+            lines.append(
+                f"`{name}` n={metric.count(*labels)} "
+                f"p50≤{format_seconds(metric.quantile(0.5, *labels))} "
+                f"p99≤{format_seconds(metric.quantile(0.99, *labels))}"
+            )
+    summary = "\n".join(lines) or "Nothing recorded yet."
+    if len(summary) > 1900:
+        summary = summary[:1900] + "\n..."
+    file = discord.File(io.BytesIO(metrics.render().encode()), filename="metrics.txt")
+    await interaction.response.send_message(summary, file=file, ephemeral=True)
+
+
+@debug_group.command(name="stalls", description="Show the longest event loop stalls and where they happened")
+async def debug_stalls(interaction: discord.Interaction):
+    worst = loop_watchdog.worst()
+    if not worst:
+        await interaction.response.send_message(
+            f"No event loop stalls over {format_seconds(loop_watchdog.threshold)} so far.", ephemeral=True
+        )
+        return
+    lines = [f"{loop_watchdog.stalls} stall(s) over {format_seconds(loop_watchdog.threshold)}, longest:"]
+    for stall in worst[:10]:
+        lines.append(f"`{stall['duration'] * 1000:.0f}ms` <t:{int(stall['started_at'])}:R> `{stall['site']}`")
+    latest = loop_watchdog.recent[-1]
+    lines.append(f"Latest: `{latest['duration'] * 1000:.0f}ms` <t:{int(latest['started_at'])}:R> `{latest['site']}`")
+    file = discord.File(io.BytesIO(loop_watchdog.report().encode()), filename="stalls.txt")
+    await interaction.response.send_message("\n".join(lines)[:1900], file=file, ephemeral=True)
+
+
 lol_group = discord.app_commands.Group(
     name="lol", description="League of Legends commands"
 )
@@ -385,50 +799,50 @@ async def add_lol_account(
     account: str,
     user: discord.Member,
 ):
-    with open('lolUsers.json', 'r') as f:
-        lol_users = json.load(f)
-    for user_entry in lol_users:
-        if user_entry["discord_id"] == str(user.id):
-            await interaction.response.send_message(
-                f"{user.name} already has an account linked.", ephemeral=True, delete_after=10
-            )
-            return
-        if user_entry["account"].lower() == account.lower():
-            await interaction.response.send_message(
-                f"{account} is already being tracked.", ephemeral=True, delete_after=10
-            )
-            return
-    lol_users.append({"account": account, "discord_id": str(user.id)})
-    with open('lolUsers.json', 'w') as f:
-        json.dump(lol_users, f, indent=2)
+    conflict = await store.call(store.add_lol_account, account, user.id)
+    if conflict == "user":
+        await interaction.response.send_message(
+            f"{user.name} already has an account linked.", ephemeral=True, delete_after=10
+        )
+        return
+    if conflict == "account":
+        await interaction.response.send_message(
+            f"{account} is already being tracked.", ephemeral=True, delete_after=10
+        )
+        return
+    lol_polls.add({"account": account, "discord_id": str(user.id)})
     await interaction.response.send_message(
         f"Added {account} for {user.name}", ephemeral=True, delete_after=10
     )
 
 
+async def search_lol_accounts(query):
+    # only re-read the accounts when they have changed since the index was built
+    global lol_index_stamp
+    if store.lol_version != lol_index_stamp:
+        stamp = store.lol_version
+        lol_users = await store.call(store.lol_accounts)
+        lol_index.sync({user["account"]: user["account"] for user in lol_users})
+        lol_index_stamp = stamp
+    return lol_index.search(query)
+
+
 async def lol_list_autocomplete(
     interaction: discord.Interaction,
     current: str,
 ) -> List[app_commands.Choice[str]]:
-    with open('lolUsers.json', 'r') as f:
-        lol_users = json.load(f)
     return [
-        app_commands.Choice(name=user["account"], value=user["account"])
-        for user in lol_users if current.lower() in user["account"].lower()
+        app_commands.Choice(name=account, value=account)
+        for account in await search_lol_accounts(current)
     ]
 
 
 @lol_group.command(name="remove", description="Remove a League of Legends account")
 @app_commands.autocomplete(account=lol_list_autocomplete)
 async def remove_lol_account(interaction: discord.Interaction, account: str):
-    with open('lolUsers.json', 'r') as f:
-        lol_users = json.load(f)
-    for user in lol_users:
-        if user["account"] == account:
-            lol_users.remove(user)
-            break
-    with open('lolUsers.json', 'w') as f:
-        json.dump(lol_users, f, indent=2)
+    await store.call(store.remove_lol_account, account)
+    streak_tracker.forget(account)
+    lol_polls.remove(account)
     await interaction.response.send_message(
         f"Removed {account}", ephemeral=True, delete_after=10
     )
@@ -436,34 +850,86 @@ async def remove_lol_account(interaction: discord.Interaction, account: str):
 
 @lol_group.command(name="list", description="List all tracked League of Legends accounts")
 async def list_lol_accounts(interaction: discord.Interaction):
-    with open('lolUsers.json', 'r') as f:
-        lol_users = json.load(f)
+    lol_users = await store.call(store.lol_accounts)
     accounts = "\n".join([f"{user['account']}" for user in lol_users])
     await interaction.response.send_message(
         f"Tracked accounts:\n{accounts}", ephemeral=True, delete_after=30
     )
 
 
+@lol_group.command(name="streak", description="Set how many games in a row count as a streak")
+@app_commands.describe(length="Number of wins or losses in a row")
+async def set_streak_length(interaction: discord.Interaction, length: int):
+    min = 2
+    max = 10
+    if length >= min and length <= max:
+        streak_tracker.set_streak_length(interaction.guild.id, length)
+        lol_polls.poll_soon()
+        await interaction.response.send_message(
+            f"A streak is now {length} games in a row", ephemeral=True, delete_after=10
+        )
+    else:
+        await interaction.response.send_message(
+            f"Streak length must be between {min} and {max} games",
+            ephemeral=True,
+            delete_after=10,
+        )
+
+
 # TASKS
-@tasks.loop(seconds=60)
-async def play_random_sounds():
-    """Background task to play the sound effect randomly while the bot is connected."""
-    # change is % chance of playing a sound effect use the change value to change the chance of playing a sound effect
-    print(f"Checking if sound effect should be played...")
-    if random.randint(1, 100) <= chance:
-        try:
-            play_sound()
-        except Exception as e:
-            print(f"Error playing sound effect: {e}")
+@tasks.loop(seconds=30)
+async def flush_play_stats():
+    try:
+        written = await asyncio.to_thread(play_stats.flush)
+        if written:
+            print(f"Flushed {written} sound play(s) to {store.path}")
+    except Exception as e:
+        print(f"Error flushing sound play statistics: {e}")
+
+
+@tasks.loop(seconds=2)
+async def watch_backend_files():
+    # the backend rewrites sounds.json and users.json, pick changes up off the event loop
+    try:
+        await asyncio.to_thread(refresh_backend_files)
+    except Exception as e:
+        print(f"Error reloading sounds.json or users.json: {e}")
 
 
-@tasks.loop(seconds=300)
-async def get_lol_data():
-    print("Checking League of Legends match streaks...")
-    with open('lolUsers.json', 'r') as f:
-        lol_users = json.load(f)
-    for user in lol_users:
-        await check_match_streak(user)
+def refresh_backend_files():
+    entrance_sounds.refresh()
+    sound_catalog.refresh()
+    refresh_sound_index()
+
+
+def refresh_sound_index():
+    # build a new index and swap it in, searches on the event loop keep using the old one
+    global sound_index, sound_index_version
+    version = sound_catalog.layout_version
+    if version != sound_index_version:
+        sound_index = SearchIndex({s['filename']: s['displayname'] for s in sound_catalog.sounds})
+        sound_index_version = version
+
+
+@tasks.loop(minutes=5)
+async def analyze_loudness():
+    # only look for new or changed files when sounds.json has changed since the last pass
+    global loudness_version
+    if sound_catalog.version == loudness_version:
+        return
+    loudness_version = sound_catalog.version
+    filenames = [s['filename'] for s in sound_catalog.all()]
+    try:
+        analyzed = await asyncio.to_thread(loudness_index.update, filenames)
+        if analyzed:
+            print(f"Analyzed loudness of {analyzed} sound(s)")
+    except Exception as e:
+        print(f"Error analyzing sound loudness: {e}")
+    # pre-encode the library with its gains so first plays don't need ffmpeg either;
+    # already encoded sounds are skipped, changed gains replace their old encodes
+    for filename in filenames:
+        if loudness_index.has(filename):
+            opus_cache.schedule(filename, loudness_index.gain_db(filename))
 
 
 # Functions
@@ -477,116 +943,288 @@ async def check_reconnection(timeout):
         print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} Bot reconnected within {timeout} seconds—no BOT_DOWN log necessary.")
 
 
-def get_entrance_sound(member: discord.Member):
-    with open('sounds.json', 'r') as f:
-        sounds = json.load(f)
-    with open('users.json', 'r') as f:
-        users = json.load(f)
-    # find the user in users.json and check for entrance_sound and then find the sound in sounds.json ["filename"]
-    for user in users:
-        if user["id"] == str(member.id):
-            if user["entrance_sound"]:
-                for sound in sounds:
-                    if sound["filename"] == user["entrance_sound"]:
-                        play_sound(sound["filename"], member)
-                        break
-            break
-
-
-def play_sound(sound: str = None, member: discord.Member = None):
-    vc = discord.utils.get(bot.voice_clients)
-    if not sound:
-        with open('sounds.json', 'r') as f:
-            sounds = json.load(f)
-        sound = random.choice(sounds)['filename']
-    if vc and vc.is_connected() and not vc.is_playing():
-        vc.play(discord.FFmpegPCMAudio(f"sounds/{sound}"))
-        print(f"Playing sound effect: {sound}")
-        if member:
-            # add log to sound
-            with open('sounds.json', 'r') as f:
-                sounds = json.load(f)
-            user_found = False
-            for s in sounds:
-                if s['filename'] == sound:
-                    if 'playedBy' not in s:
-                        s['playedBy'] = []
-                    for user in s['playedBy']:
-                        if user["id"] == str(member.id):
-                            user["times"] += 1
-                            user_found = True
-                            break
-                    if not user_found:
-                        s['playedBy'].append({"id": str(member.id),"name": member.name, "times": 1})
-                    updateLog(member, None, None, s)
-                    break
-            with open('sounds.json', 'w') as f:
-                json.dump(sounds, f, indent=2)
-    elif vc and vc.is_playing():
-        raise Exception("A sound is already playing")
-    elif not vc or not vc.is_connected():
-        play_random_sounds.cancel()
+async def play_entrance_sound(member: discord.Member, joined_at: float, connect_to=None):
+    """Play the member's entrance sound, if they have one.
+
+    With ``connect_to`` the bot joins that channel first; the sound is opened in a thread
+    while the voice handshake is in flight and queued the moment the connection is up.
+    """
+    filename = entrance_sounds.get(member.id)
+    if filename and not sound_catalog.get(filename):
+        filename = None
+    # the gateway event's wall clock time, moved onto the perf_counter clock
+    requested_at = time.perf_counter() - max(0.0, time.time() - joined_at)
+    if connect_to is None:
+        if filename:
+            play_sound(filename, member, requested_at=requested_at, latency=JOIN_TO_AUDIO_SECONDS.bind("connected"))
+        return
+
+    opening = asyncio.create_task(asyncio.to_thread(open_sound, filename)) if filename else None
+    try:
+        await voice_sessions.connect(connect_to)
+    except BaseException:
+        if opening:
+            opening.add_done_callback(discard_opened)
+        raise
+    if opening is None:
+        return
+    try:
+        prepared = await opening
+    except Exception as e:
+        print(f"Error preparing entrance sound {filename}: {e}")
+        return
+    try:
+        record_play(filename, member)
+    except BaseException:
+        prepared[0].cleanup()
+        raise
+    play_sound(
+        filename, member, requested_at=requested_at, prepared=prepared,
+        latency=JOIN_TO_AUDIO_SECONDS.bind("connect"),
+    )
+
+
+def play_random_sound(guild_id):
+    """Called by the random sound scheduler. Returns False once the guild has no voice connection."""
+    session = voice_sessions.sessions.get(guild_id)
+    guild = bot.get_guild(guild_id)
+    if session is None or guild is None or not session.is_connected():
+        return False
+    print(f"Playing a random sound effect in guild {guild_id}")
+    run_in_background(play_picked_sound(guild))
+
+
+async def play_picked_sound(guild: discord.Guild):
+    try:
+        play_sound(await pick_sound(guild), guild=guild)
+    except Exception as e:
+        print(f"Error playing random sound effect in guild {guild.id}: {e}")
+
+
+async def pick_sound(guild: discord.Guild):
+    """A random sound filename for the guild, drawn with its random sound policy."""
+    settings = random_sounds.settings(guild.id)
+    sound = await sound_picker.pick(guild.id, settings["policy"], settings["category"], settings["boost"])
+    if sound is None:
+        raise Exception("There are no sound effects to pick from")
+    return sound
+
+
+def play_sound(
+    sound: str = None, member: discord.Member = None, guild: discord.Guild = None,
+    requested_at: float = None, prepared=None, latency=CLICK_TO_PLAY_SECONDS,
+):
+    guild = guild or member.guild
+    session = voice_sessions.get(guild.id)
+    if not session.is_connected() and guild.voice_client:
+        voice_sessions.attach(guild.voice_client)
+    if not session.is_connected():
+        if prepared is not None:
+            prepared[0].cleanup()
         raise Exception("Not connected to a voice channel")
+    sound_picker.played(guild.id, sound)
+    # the guild's session plays it as soon as the sounds queued before it have finished
+    return session.enqueue(sound, member, requested_at, prepared, latency)
+
+
+def run_in_background(coro):
+    # keep a reference so the task isn't garbage collected before it finishes
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+async def connect_and_play(member: discord.Member, sound: str = None, requested_at: float = None):
+    """Join the member's voice channel and queue a sound (a random one without ``sound``).
+
+    Returns once the sound has reached the mixer, or after PLAYBACK_START_TIMEOUT while it
+    is still queued; returns False if it was dropped.
+    """
+    if member.voice is None or member.voice.channel is None:
+        raise Exception("You are not in a voice channel")
+    await voice_sessions.connect(member.voice.channel)
+    if sound:
+        started = play_sound(sound, member, requested_at=requested_at)
+    else:
+        started = play_sound(await pick_sound(member.guild), guild=member.guild, requested_at=requested_at)
+    try:
+        return await asyncio.wait_for(asyncio.shield(started), PLAYBACK_START_TIMEOUT)
+    except asyncio.TimeoutError:
+        return True
+
+
+async def reply_when_playing(interaction: discord.Interaction, sound: str, requested_at: float, message: str):
+    """Background half of a deferred sound command: play, then replace the "thinking" reply."""
+    try:
+        if await connect_and_play(interaction.user, sound, requested_at):
+            content = message
+        else:
+            content = "The playback queue is full, try again in a moment"
+    except Exception as e:
+        content = f"Error playing sound effect: {e}"
+    await replace_response(interaction, content)
+
 
+async def replace_response(interaction: discord.Interaction, content: str, delete_after: float = 10):
+    """Replace a deferred "thinking" reply with ``content`` and delete it after a while."""
+    try:
+        await interaction.edit_original_response(content=content)
+        await asyncio.sleep(delete_after)
+        await interaction.delete_original_response()
+    except discord.HTTPException as e:
+        print(f"Error updating the response to {interaction.user.name}: {e}")
+
+
+def prepare_sound(sound: str, member: discord.Member = None):
+    """Open a sound and count the play. Runs on a worker thread, see VoiceSession."""
+    prepared = open_sound(sound)
+    if member:
+        try:
+            record_play(sound, member)
+        except BaseException:
+            # e.g. the member left while the sound was queued; nothing else owns the source
+            prepared[0].cleanup()
+            raise
+    return prepared
+
+
+def open_sound(sound: str):
+    """Open a sound for playback. Returns (source, gain)."""
+    start = time.perf_counter()
+    # the loudness gain goes into the encode, so a lone sound can be passed through as is
+    gain_db = loudness_index.gain_db(sound)
+    source = opus_cache.source(sound, gain_db)
+    if source is None:
+        # not encoded yet: stream through ffmpeg this time and encode it for next time
+        if loudness_index.has(sound):
+            # a sound without a loudness entry yet is encoded once the loudness pass has run
+            opus_cache.schedule(sound, gain_db)
+        source = discord.FFmpegOpusAudio(f"sounds/{sound}", options=" ".join(volume_filter(gain_db)) or None)
+        SOUND_PREPARE_SECONDS.observe(time.perf_counter() - start, "ffmpeg")
+    else:
+        SOUND_PREPARE_SECONDS.observe(time.perf_counter() - start, "opus_cache")
+    print(f"Playing sound effect: {sound}")
+    return source, 1.0
+
+
+def discard_opened(task):
+    # done callback for an open_sound task whose sound will never be played
+    if not task.cancelled() and task.exception() is None:
+        task.result()[0].cleanup()
+
+
+def record_play(sound: str, member: discord.Member):
+    # count the play in memory, flush_play_stats writes it to the store
+    s = sound_catalog.get(sound)
+    if s:
+        play_stats.record(sound, member.id, member.name)
+        updateLog(member, None, None, s)
+
+
+async def fetch_api(path, params=None):
+    endpoint = endpoint_name(path)
+    start = time.perf_counter()
+    status = "error"
+    try:
+        data = await riot_client.get(path, params=params)
+        status = "200"
+        return data
+    except aiohttp.ClientResponseError as e:
+        status = str(e.status)
+        raise
+    finally:
+        RIOT_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+        RIOT_REQUESTS.inc(endpoint, status)
+
+async def get_puuid(riot_name, riot_tag):
+    riot_id = f"{riot_name}#{riot_tag}"
+    # memory hits stay on the loop, the SQLite file is only read and written in a thread
+    puuid = riot_cache.get_puuid(riot_id, memory_only=True)
+    if not puuid:
+        puuid = await asyncio.to_thread(riot_cache.get_puuid, riot_id)
+    if not puuid:
+        data = await fetch_api(f"/riot/account/v1/accounts/by-riot-id/{riot_name}/{riot_tag}")
+        puuid = data["puuid"]
+        await asyncio.to_thread(riot_cache.set_puuid, riot_id, puuid)
+    return puuid
+
+async def get_match_result(match_id):
+    # finished matches never change, so the {puuid: win} map is cached forever
+    results = riot_cache.get_match_result(match_id, memory_only=True)
+    if results is None:
+        results = await asyncio.to_thread(riot_cache.get_match_result, match_id)
+    if results is None:
+        match_details = await fetch_api(f"/lol/match/v5/matches/{match_id}")
+        participants = match_details["info"]["participants"]
+        results = {participant["puuid"]: participant["win"] for participant in participants}
+        await asyncio.to_thread(riot_cache.set_match_result, match_id, results)
+    return results
+
+async def poll_lol_account(user):
+    """Called by the LoL poll scheduler for each account when its next poll is due."""
+    start = time.perf_counter()
+    result = await check_match_streak(user)
+    label = {True: "new_match", False: "unchanged", None: "error"}[result]
+    LOL_POLLS.inc(label)
+    LOL_POLL_SECONDS.observe(time.perf_counter() - start, label)
+    return result
 
-async def fetch_api(url, params):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params) as resp:
-            resp.raise_for_status()
-            return await resp.json()
 
 async def check_match_streak(user):
+    """Fold the account's new matches into its streak. Returns True if there were any,
+    False if nothing changed and None when the Riot API failed."""
     riot_name, riot_tag = user["account"].split("#")
     try:
-        # Fetch the puuid using aiohttp
-        url = f"https://europe.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{riot_name}/{riot_tag}"
-        data = await fetch_api(url, params={"api_key": config.LOL_API_KEY})
-        puuid = data["puuid"]
+        puuid = await get_puuid(riot_name, riot_tag)
+
+        guild = bot.get_guild(476435508638253056)
+        streak_length = streak_tracker.streak_length(guild.id)
 
         # Fetch the match IDs
-        url = f"https://europe.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids"
-        match_ids = await fetch_api(url, params={"queueId": 420, "count": 2, "api_key": config.LOL_API_KEY})
-
-        # Fetch match details for each match ID
-        win_statuses = []
-        for match_id in match_ids:
-            url = f"https://europe.api.riotgames.com/lol/match/v5/matches/{match_id}"
-            match_details = await fetch_api(url, params={"api_key": config.LOL_API_KEY})
-            participants = match_details["info"]["participants"]
-            for participant in participants:
-                if participant["puuid"] == puuid:
-                    win_statuses.append(participant["win"])
-                    break
+        match_ids = await fetch_api(
+            f"/lol/match/v5/matches/by-puuid/{puuid}/ids",
+            params={"queueId": 420, "count": streak_length},
+        )
+        state = streak_tracker.state(user["account"])
+        if not match_ids or (state and state["last_match_id"] == match_ids[0]):
+            # no new games since the last poll
+            return False
+
+        # Fetch results for the new matches only, cached matches cost no request
+        new_match_ids = streak_tracker.new_match_ids(user["account"], match_ids)
+        all_results = await asyncio.gather(*(get_match_result(match_id) for match_id in new_match_ids))
+        win_statuses = [results[puuid] for results in all_results if puuid in results]
+        state = streak_tracker.fold(user["account"], match_ids, win_statuses)
 
         # Continue with updating nickname...
-        guild = bot.get_guild(476435508638253056)
         member = guild.get_member(int(user["discord_id"]))
         if member:
-            new_nick = member.display_name
-            if len(win_statuses) == 2:
-                if all(win_statuses):
-                    if "(win streak)" not in new_nick:
-                        new_nick = new_nick.replace("(loss streak)", "").strip() + " (win streak)"
-                elif not any(win_statuses):
-                    if "(loss streak)" not in new_nick:
-                        new_nick = new_nick.replace("(win streak)", "").strip() + " (loss streak)"
-                else:
-                    new_nick = new_nick.replace("(win streak)", "").replace("(loss streak)", "").strip()
-                
-                if new_nick != member.display_name:
-                    try:
-                        await member.edit(nick=new_nick)
-                        print(f"Updated {member.name} nickname to: {new_nick}")
-                    except discord.errors.Forbidden:
-                        print(f"Missing permissions to change nickname for {member.name}")
+            new_nick = streak_nick(member.display_name, state, streak_length)
+            if new_nick != member.display_name:
+                try:
+                    await member.edit(nick=new_nick)
+                    streak_tracker.set_nick(user["account"], new_nick)
+                    print(f"Updated {member.name} nickname to: {new_nick}")
+                except discord.errors.Forbidden:
+                    print(f"Missing permissions to change nickname for {member.name}")
+        streak_tracker.save()
+        return True
 
     except Exception as e:
         print(f"Error fetching data from the League of Legends API: {e}")
 
-def updateLog(member, before, after, sound = None):
-    with open('logs.json', 'r') as f:
-        log = json.load(f)
+async def get_notify_channel():
+    # resolve your DM channel once instead of fetching the user on every event
+    global notify_channel
+    if notify_channel is None:
+        user = bot.get_user(config.USER_ID) or await bot.fetch_user(config.USER_ID)
+        notify_channel = user.dm_channel or await user.create_dm()
+    return notify_channel
+
 
+def updateLog(member, before, after, sound = None, timestamp = None):
+    timestamp = int(timestamp or time.time())
     event = None
     if sound:
         event = "PLAYED_SOUND"
@@ -608,7 +1246,7 @@ def updateLog(member, before, after, sound = None):
         if sound:
             log_entry = {
                 "event": event,
-                "timestamp": int(time.time()),
+                "timestamp": timestamp,
                 "user": {
                     "id": member.id,
                     "name": member.name,
@@ -631,46 +1269,67 @@ def updateLog(member, before, after, sound = None):
         else:
             log_entry = {
                 "event": event,
-                "timestamp": int(time.time()),
+                "timestamp": timestamp,
                 "user": {
                     "id": member.id,
                     "name": member.name,
                     "nick": member.nick,
                     "is_on_mobile": member.is_on_mobile(),
                 },
+                # taken from the event itself, member.voice may have moved on since
                 "voiceState": {
-                    "deafened": False if event == "LEFT_CHANNEL" else member.voice.self_deaf,
-                    "muted": False if event == "LEFT_CHANNEL" else member.voice.self_mute,
+                    "deafened": False if event == "LEFT_CHANNEL" else after.self_deaf,
+                    "muted": False if event == "LEFT_CHANNEL" else after.self_mute,
                 },
                 "channel": {
                     "id": after.channel.id if after.channel else (before.channel.id if before.channel else member.voice.channel.id),
                     "name": after.channel.name if after.channel else (before.channel.name if before.channel else member.voice.channel.name)
                 }
             }
-        log.append(log_entry)
+        start = time.perf_counter()
+        event_log.append(log_entry)
+        LOG_WRITE_SECONDS.observe(time.perf_counter() - start)
+
+def import_json_files():
+    """Move the bot-owned JSON files into the store and bring the backend's copies up to date."""
+    store.import_lol_users("lolUsers.json")
+    refresh_backend_files()
+    play_stats.export()
 
-        with open('logs.json', 'w') as f:
-            json.dump(log, f, indent=2)
 
 def log_bot_down(reason="Bot shut down"):
-    with open('logs.json', 'r') as f:
-        logs = json.load(f)
+    last = event_log.last()
     # Only log if the last entry is not a "BOT_DOWN" event.
-    if not logs or logs[-1].get("event") != "BOT_DOWN":
-        logs.append({
+    if not last or last.get("event") != "BOT_DOWN":
+        event_log.append({
             "event": "BOT_DOWN",
             "timestamp": int(time.time()),
             "reason": reason
         })
-        with open('logs.json', 'w') as f:
-            json.dump(logs, f, indent=2)
         print("BOT_DOWN event logged.")
 
-atexit.register(log_bot_down)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the soundboard bot")
+    parser.add_argument("--sync", action="store_true", help="sync slash commands even if they are unchanged")
+    parser.add_argument(
+        "--sync-guild", type=int, action="append", default=[], metavar="GUILD_ID",
+        help="sync slash commands to this guild only (repeatable), instead of globally",
+    )
+    args = parser.parse_args()
+    force_command_sync = args.sync
+    command_sync_guilds = args.sync_guild
+
+    event_log.migrate("logs.json")
+    import_json_files()
+    # atexit runs these last to first: the flush still needs the store
+    atexit.register(store.close)
+    atexit.register(riot_cache.close)
+    atexit.register(log_bot_down)
+    atexit.register(play_stats.flush)
 
-try:
-    bot.run(config.TOKEN)
-except Exception as e:
-    print(f"Error starting bot: {e}")
-    log_bot_down("Error starting bot")
-    raise e
+    try:
+        bot.run(config.TOKEN)
+    except Exception as e:
+        print(f"Error starting bot: {e}")
+        log_bot_down("Error starting bot")
+        raise e
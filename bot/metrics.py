@@ -0,0 +1,241 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+# seconds; covers everything from a cached lookup to a slow Riot API cycle
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count, one series per combination of label values."""
+
+    kind = "counter"
+
+    def __init__(self, registry, name, help, labels=()):
+        self._registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        if not self._registry.enabled:
+            return
+        with self._registry.lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        return [
+            f"{self.name}{_label_text(self.labels, labels)} {_format_number(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Histogram:
+    """Bucketed distribution of observed values (seconds unless the name says otherwise)."""
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self._registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # per series: [count per bucket (+Inf last), sum]
+        self._series = {}
+
+    def observe(self, value, *labels):
+        if not self._registry.enabled:
+            return
+        i = bisect_left(self.buckets, value)
+        with self._registry.lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def bind(self, *labels):
+        """A handle whose ``observe(value)`` records into the series with these label values."""
+        return BoundHistogram(self, labels)
+
+    def time(self, *labels):
+        """Decorator observing how long each call of a coroutine function takes."""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, *labels)
+            return wrapper
+        return decorator
+
+    def series(self):
+        """Label values of every series observed so far."""
+        return list(self._series)
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def quantile(self, q, *labels):
+        """Upper bound of the bucket holding the q-quantile, None without observations."""
+        series = self._series.get(labels)
+        if not series:
+            return None
+        counts = series[0]
+        rank = q * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = []
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_label_text(self.labels, labels, [('le', bound)])} {cumulative}"
+                )
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_label_text(self.labels, labels, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, labels)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class BoundHistogram:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def observe(self, value):
+        self.histogram.observe(value, *self.labels)
+
+
+class MetricsRegistry:
+    """Counters and latency histograms, rendered in the Prometheus text format.
+
+    While ``enabled`` is False every ``inc``/``observe`` returns after one attribute
+    check, so instrumented code costs next to nothing when metrics are switched off.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._runner = None
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(self, name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, help, labels, buckets))
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for metric in self.metrics.values():
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, port, host="127.0.0.1"):
+        """Serve ``/metrics`` over HTTP on a local port. Calling it again is a no-op."""
+        if self._runner is not None:
+            return
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        print(f"Serving metrics on http://{host}:{port}/metrics")
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics = MetricsRegistry()
+
+CLICK_TO_PLAY_SECONDS = metrics.histogram(
+    "bot_click_to_play_seconds", "Soundboard click or sound command until the sound is handed to the mixer"
+)
+VOICE_STATE_UPDATE_SECONDS = metrics.histogram(
+    "bot_voice_state_update_seconds", "Time spent in on_voice_state_update"
+)
+VOICE_HANDLER_SECONDS = metrics.histogram(
+    "bot_voice_handler_seconds", "Time spent per voice event in each pipeline handler", ["handler"]
+)
+RIOT_REQUEST_SECONDS = metrics.histogram(
+    "bot_riot_request_seconds", "fetch_api latency including retries", ["endpoint"]
+)
+RIOT_REQUESTS = metrics.counter(
+    "bot_riot_requests_total", "fetch_api calls by endpoint and final status", ["endpoint", "status"]
+)
+LOG_WRITE_SECONDS = metrics.histogram(
+    "bot_log_write_seconds", "Time spent appending an entry to the event log in updateLog"
+)
+SOUND_PREPARE_SECONDS = metrics.histogram(
+    "bot_sound_prepare_seconds", "Time spent opening a sound for playback", ["source"]
+)
+LOL_POLLS = metrics.counter(
+    "bot_lol_polls_total", "LoL account polls by result", ["result"]
+)
+LOL_POLL_SECONDS = metrics.histogram(
+    "bot_lol_poll_seconds", "Time one LoL account poll took, Riot requests and nickname update included", ["result"]
+)
+JOIN_TO_AUDIO_SECONDS = metrics.histogram(
+    "bot_join_to_audio_seconds",
+    "Member joining a voice channel until their entrance sound is handed to the mixer",
+    ["path"],
+)
+INTERACTION_ACK_SECONDS = metrics.histogram(
+    "bot_interaction_ack_seconds", "Interaction received until it was acknowledged", ["command"]
+)
+LOOP_LAG_SECONDS = metrics.histogram(
+    "bot_loop_lag_seconds", "How late the watchdog heartbeat woke up on the event loop"
+)
+LOOP_STALLS = metrics.counter(
+    "bot_loop_stalls_total", "Event loop stalls longer than the watchdog threshold"
+)
@@ -0,0 +1,130 @@
+import threading
+
+import discord
+import numpy as np
+
+# 20 ms of 48 kHz stereo int16 PCM, the frame discord.py expects from a PCM source
+FRAME_SAMPLES = 960 * 2
+FRAME_BYTES = FRAME_SAMPLES * 2
+# gains are applied in Q12 fixed point so mixing stays in integer arithmetic
+GAIN_ONE = 1 << 12
+# gains this close to 1 (about +-0.5 dB) are not worth decoding a lone track for
+UNITY_TOLERANCE = 0.06
+
+
+class MixerTrack:
+    def __init__(self, source, gain=1.0):
+        self.source = source
+        if abs(gain - 1.0) < UNITY_TOLERANCE:
+            gain = 1.0
+        self.gain = int(round(gain * GAIN_ONE))
+        self._decoder = None
+
+    def read_packet(self):
+        """Next Opus packet, skipping the Ogg header packets FFmpegOpusAudio passes through."""
+        while True:
+            packet = self.source.read()
+            if not packet.startswith((b"OpusHead", b"OpusTags")):
+                return packet
+
+    def read_pcm(self):
+        if not self.source.is_opus():
+            return self.source.read()
+        packet = self.read_packet()
+        if not packet:
+            return b""
+        if self._decoder is None:
+            self._decoder = discord.opus.Decoder()
+        return self._decoder.decode(packet)
+
+
+class Mixer(discord.AudioSource):
+    """Mixes up to ``max_voices`` sources into one stream, one 20 ms frame per read.
+
+    With a single Opus track at (near) unity gain the track's packets are passed
+    through untouched; sounds from the Opus cache have their loudness gain encoded in
+    already. Otherwise every track is decoded to PCM, summed in int32 with its gain
+    and clipped back to int16. ``read`` returns b"" once no tracks are left, which ends
+    playback; adding a track afterwards needs a new ``VoiceClient.play``.
+    """
+
+    def __init__(self, max_voices=8, on_track_end=None):
+        self.max_voices = max_voices
+        self.on_track_end = on_track_end
+        self._tracks = []
+        self._lock = threading.Lock()
+        self._acc = np.zeros(FRAME_SAMPLES, dtype=np.int32)
+        self._opus = False
+
+    def add(self, source, gain=1.0):
+        """Start mixing in a source. Returns False when all voices are in use."""
+        with self._lock:
+            if len(self._tracks) >= self.max_voices:
+                return False
+            self._tracks.append(MixerTrack(source, gain))
+        return True
+
+    def active(self):
+        return len(self._tracks)
+
+    def is_full(self):
+        return len(self._tracks) >= self.max_voices
+
+    def is_opus(self):
+        # discord.py asks after each read(), so this describes the frame just returned
+        return self._opus
+
+    def read(self):
+        with self._lock:
+            tracks = list(self._tracks)
+        while len(tracks) == 1 and tracks[0].source.is_opus() and tracks[0].gain == GAIN_ONE:
+            packet = tracks[0].read_packet()
+            if packet:
+                self._opus = True
+                return packet
+            self._finish(tracks)
+            tracks = []
+        self._opus = False
+        if not tracks:
+            return b""
+        return self._mix(tracks)
+
+    def _mix(self, tracks):
+        acc = self._acc
+        acc.fill(0)
+        finished = []
+        for track in tracks:
+            pcm = track.read_pcm()
+            if not pcm:
+                finished.append(track)
+                continue
+            samples = np.frombuffer(pcm, dtype=np.int16, count=min(len(pcm), FRAME_BYTES) // 2)
+            n = len(samples)
+            if track.gain == GAIN_ONE:
+                acc[:n] += samples
+            else:
+                acc[:n] += (samples.astype(np.int32) * track.gain) >> 12
+        if finished:
+            self._finish(finished)
+            if len(finished) == len(tracks):
+                return b""
+        np.clip(acc, -32768, 32767, out=acc)
+        return acc.astype(np.int16).tobytes()
+
+    def _finish(self, finished):
+        with self._lock:
+            self._tracks = [t for t in self._tracks if t not in finished]
+        for track in finished:
+            track.source.cleanup()
+        if self.on_track_end is not None:
+            self.on_track_end()
+
+    def cleanup(self):
+        # called by discord.py when playback stops; tracks added meanwhile are kept
+        pass
+
+    def clear(self):
+        with self._lock:
+            tracks, self._tracks = self._tracks, []
+        for track in tracks:
+            track.source.cleanup()
@@ -0,0 +1,171 @@
+import os
+import re
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import discord
+from discord.oggparse import OggStream
+
+
+class OpusPacketSource(discord.AudioSource):
+    """Plays a list of pre-encoded 20 ms Opus packets without ffmpeg or a Python encoder."""
+
+    def __init__(self, packets):
+        self._packets = packets
+        self._index = 0
+
+    def read(self):
+        if self._index >= len(self._packets):
+            return b""
+        packet = self._packets[self._index]
+        self._index += 1
+        return packet
+
+    def is_opus(self):
+        return True
+
+
+class OpusCache:
+    """Transcodes each sound once to 48 kHz stereo Opus and keeps the packets around.
+
+    Encoded files live in ``cache_dir`` named after the source file's mtime and size, so
+    a re-uploaded sound gets a fresh entry. A loudness gain in dB is applied while
+    encoding and is part of the name too, so normalized sounds still play as plain
+    packets. The most recently played sounds are also kept in memory, up to
+    ``max_memory_bytes`` of packet data.
+    """
+
+    def __init__(
+        self,
+        sound_dir="sounds",
+        cache_dir="opusCache",
+        max_memory_bytes=64 * 1024 * 1024,
+        executable="ffmpeg",
+        bitrate=128,
+    ):
+        self.sound_dir = sound_dir
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.executable = executable
+        self.bitrate = bitrate
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="opus-transcode")
+
+    def _stamp(self, filename):
+        st = os.stat(os.path.join(self.sound_dir, filename))
+        return f"{st.st_mtime_ns}-{st.st_size}"
+
+    def _cache_path(self, filename, stamp, gain_db=0.0):
+        gain_db = round(gain_db, 1)
+        if not gain_db:
+            return os.path.join(self.cache_dir, f"{filename}.{stamp}.ogg")
+        return os.path.join(self.cache_dir, f"{filename}.{stamp}.{gain_db:+.1f}dB.ogg")
+
+    def source(self, filename, gain_db=0.0):
+        """Return an OpusPacketSource for the sound, or None if it isn't encoded yet."""
+        packets = self.packets(filename, gain_db)
+        if packets is None:
+            return None
+        return OpusPacketSource(packets)
+
+    def packets(self, filename, gain_db=0.0):
+        stamp = self._stamp(filename)
+        key = (filename, stamp, round(gain_db, 1))
+        with self._lock:
+            packets = self._memory.get(key)
+            if packets is not None:
+                self._memory.move_to_end(key)
+                return packets
+        path = self._cache_path(filename, stamp, gain_db)
+        if not os.path.exists(path):
+            return None
+        packets = _read_packets(path)
+        self._remember(key, packets)
+        return packets
+
+    def _remember(self, key, packets):
+        size = sum(len(p) for p in packets)
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = packets
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= sum(len(p) for p in evicted)
+
+    def schedule(self, filename, gain_db=0.0):
+        """Transcode the sound on the background worker unless it's cached or queued."""
+        job = (filename, round(gain_db, 1))
+        with self._lock:
+            if job in self._pending:
+                return
+            self._pending.add(job)
+        self._executor.submit(self._transcode_job, job)
+
+    def _transcode_job(self, job):
+        filename, gain_db = job
+        try:
+            self.transcode(filename, gain_db)
+        except Exception as e:
+            print(f"Error transcoding {filename} to Opus: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(job)
+
+    def transcode(self, filename, gain_db=0.0):
+        """Encode the sound into the disk cache (blocking). Returns the cache path."""
+        stamp = self._stamp(filename)
+        path = self._cache_path(filename, stamp, gain_db)
+        if os.path.exists(path):
+            return path
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = path + ".tmp"
+        # same encoder settings discord.FFmpegOpusAudio uses
+        args = [
+            self.executable, "-i", os.path.join(self.sound_dir, filename),
+            "-map_metadata", "-1",
+            *volume_filter(gain_db),
+            "-f", "opus",
+            "-c:a", "libopus",
+            "-ar", "48000",
+            "-ac", "2",
+            "-b:a", f"{self.bitrate}k",
+            "-loglevel", "warning",
+            "-fec", "true",
+            "-packet_loss", "15",
+            "-frame_duration", "20",
+            "-y", tmp_path,
+        ]
+        subprocess.run(args, check=True, stdin=subprocess.DEVNULL, capture_output=True)
+        os.replace(tmp_path, path)
+        self._remove_stale(filename, path)
+        return path
+
+    def _remove_stale(self, filename, keep):
+        stale = re.compile(re.escape(filename) + r"\.\d+-\d+(\.[+-]\d+\.\ddB)?\.ogg")
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if stale.fullmatch(name) and path != keep:
+                os.remove(path)
+
+
+def volume_filter(gain_db):
+    """ffmpeg arguments that apply ``gain_db``, none at (rounded) unity."""
+    gain_db = round(gain_db, 1)
+    return ["-af", f"volume={gain_db:.1f}dB"] if gain_db else []
+
+
+def _read_packets(path):
+    with open(path, 'rb') as f:
+        return [
+            packet for packet in OggStream(f).iter_packets()
+            if not packet.startswith((b"OpusHead", b"OpusTags"))
+        ]
@@ -0,0 +1,61 @@
+import json
+import os
+import threading
+
+from store import store as default_store
+
+
+class PlayStats:
+    """Write-behind play counters.
+
+    Plays are counted in memory per (sound filename, user id) and added to the store's
+    play counts by ``flush``, one transaction per batch. Each flush also exports the
+    totals to ``export_path`` (playCounts.json), which the web backend serves as the
+    ``playedBy`` lists of /api/sounds, so the bot never has to rewrite sounds.json.
+    """
+
+    def __init__(self, store=None, export_path="playCounts.json"):
+        self.store = store or default_store
+        self.export_path = export_path
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._names = {}
+
+    def record(self, filename, user_id, name):
+        key = (filename, str(user_id))
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+            self._names[str(user_id)] = name
+
+    def pending(self):
+        with self._lock:
+            return sum(self._pending.values())
+
+    def flush(self):
+        """Add pending counts to the store and re-export them. Returns the number of plays written."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending, names = self._pending, self._names
+            self._pending, self._names = {}, {}
+        try:
+            written = self.store.add_plays(pending, names)
+        except Exception:
+            # put the counts back so the next flush retries them
+            with self._lock:
+                for key, times in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + times
+                for user_id, name in names.items():
+                    self._names.setdefault(user_id, name)
+            raise
+        self.export()
+        return written
+
+    def export(self):
+        tmp_path = self.export_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.store.play_counts(), f)
+        os.replace(tmp_path, self.export_path)
+
+
+play_stats = PlayStats()
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+import random
+import threading
+
+from deadlines import DeadlineScheduler
+
+DEFAULT_INTERVAL = 60
+DEFAULT_CHANCE = 50
+DEFAULT_POLICY = "uniform"
+# guilds opt in with /sound toggle
+DEFAULT_ENABLED = False
+
+
+class RandomSoundScheduler:
+    """Random sound effects for every guild, driven by one DeadlineScheduler.
+
+    Each guild has its own interval, chance and enabled flag (off until someone turns
+    it on), persisted to a JSON file along with how its random sounds are picked (see
+    SoundPicker). A guild is active while the bot is connected there; active guilds
+    have a deadline at their next fire time. When it is due the guild's chance is
+    rolled and its next deadline set, so there are no wakeups at all while no guild is
+    active.
+    """
+
+    def __init__(self, fire, path="randomSounds.json", rng=random):
+        self.fire = fire
+        self.path = path
+        self.rng = rng
+        self._lock = threading.Lock()
+        self.guilds = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.guilds = json.load(f)
+        self._deadlines = DeadlineScheduler(self._due)
+        self._active = set()
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.guilds, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def settings(self, guild_id):
+        settings = self.guilds.get(str(guild_id), {})
+        return {
+            "enabled": settings.get("enabled", DEFAULT_ENABLED),
+            "interval": settings.get("interval", DEFAULT_INTERVAL),
+            "chance": settings.get("chance", DEFAULT_CHANCE),
+            "policy": settings.get("policy", DEFAULT_POLICY),
+            "category": settings.get("category"),
+            "boost": settings.get("boost", 1.0),
+        }
+
+    def _update(self, guild_id, **changes):
+        self.guilds.setdefault(str(guild_id), {}).update(changes)
+        self.save()
+        self._reschedule(guild_id)
+
+    def set_enabled(self, guild_id, enabled):
+        self._update(guild_id, enabled=enabled)
+
+    def set_interval(self, guild_id, seconds):
+        self._update(guild_id, interval=seconds)
+
+    def set_chance(self, guild_id, percentage):
+        self._update(guild_id, chance=percentage)
+
+    def set_policy(self, guild_id, policy, category=None, boost=1.0):
+        # only changes which sound plays, not when
+        self.guilds.setdefault(str(guild_id), {}).update(policy=policy, category=category, boost=boost)
+        self.save()
+
+    def activate(self, guild_id):
+        """The bot is connected in this guild; start its timer unless it is already running."""
+        if guild_id in self._active:
+            return
+        self._active.add(guild_id)
+        self._reschedule(guild_id)
+
+    def deactivate(self, guild_id):
+        self._active.discard(guild_id)
+        self._deadlines.cancel(guild_id)
+
+    def is_scheduled(self, guild_id):
+        return guild_id in self._active and self.settings(guild_id)["enabled"]
+
+    def _reschedule(self, guild_id, due=None):
+        settings = self.settings(guild_id)
+        if guild_id not in self._active or not settings["enabled"]:
+            self._deadlines.cancel(guild_id)
+            return
+        if due is None:
+            due = asyncio.get_running_loop().time() + settings["interval"]
+        self._deadlines.schedule(guild_id, due)
+
+    async def _due(self, guild_id, due):
+        settings = self.settings(guild_id)
+        # after a stall, skip the missed ticks instead of playing them back to back
+        self._reschedule(guild_id, max(due + settings["interval"], asyncio.get_running_loop().time()))
+        if self.rng.randint(1, 100) > settings["chance"]:
+            return
+        try:
+            if self.fire(guild_id) is False:
+                self.deactivate(guild_id)
+        except Exception as e:
+            print(f"Error playing random sound effect in guild {guild_id}: {e}")
+
+    def close(self):
+        self._deadlines.close()
+        self._active.clear()
@@ -0,0 +1,119 @@
+import asyncio
+import re
+import time
+from collections import deque
+
+import aiohttp
+
+RIOT_BASE_URL = "https://europe.api.riotgames.com"
+# Riot's default (development key) limits: 20 requests every 1 second, 100 every 2 minutes
+RIOT_RATE_LIMITS = ((20, 1.0), (100, 120.0))
+# request paths with their ids replaced, so metrics get one series per endpoint
+RIOT_ENDPOINTS = (
+    (re.compile(r"^/riot/account/v1/accounts/by-riot-id/[^/]+/[^/]+$"), "/riot/account/v1/accounts/by-riot-id/{name}/{tag}"),
+    (re.compile(r"^/lol/match/v5/matches/by-puuid/[^/]+/ids$"), "/lol/match/v5/matches/by-puuid/{puuid}/ids"),
+    (re.compile(r"^/lol/match/v5/matches/[^/]+$"), "/lol/match/v5/matches/{matchId}"),
+)
+
+
+def endpoint_name(path):
+    for pattern, name in RIOT_ENDPOINTS:
+        if pattern.match(path):
+            return name
+    return "other"
+
+
+class RateLimiter:
+    """Client-side limiter for Riot's stacked request windows.
+
+    Each (count, seconds) limit is a bucket of ``count`` tokens; a token is spent per
+    request and comes back once that request falls out of the bucket's window, so no
+    window ever sees more than ``count`` requests. ``pause`` blocks every caller until
+    a server supplied ``Retry-After`` has passed.
+    """
+
+    def __init__(self, limits=RIOT_RATE_LIMITS, clock=time.monotonic):
+        self.limits = tuple(limits)
+        self._clock = clock
+        self._sent = [deque() for _ in self.limits]
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _delay(self, now):
+        delay = max(0.0, self._blocked_until - now)
+        for (count, period), sent in zip(self.limits, self._sent):
+            while sent and sent[0] <= now - period:
+                sent.popleft()
+            if len(sent) >= count:
+                delay = max(delay, sent[0] + period - now)
+        return delay
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = self._clock()
+                delay = self._delay(now)
+                if delay <= 0:
+                    for sent in self._sent:
+                        sent.append(now)
+                    return
+                await asyncio.sleep(delay)
+
+    def pause(self, seconds):
+        self._blocked_until = max(self._blocked_until, self._clock() + seconds)
+
+
+class RiotClient:
+    """Riot API client sharing one pooled aiohttp session and a rate limiter across all calls."""
+
+    def __init__(
+        self,
+        api_key,
+        base_url=RIOT_BASE_URL,
+        limiter=None,
+        max_concurrency=8,
+        max_retries=3,
+        timeout=10,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.limiter = limiter or RateLimiter()
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._session = None
+        self._semaphore = None
+
+    def _ensure_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency, ttl_dns_cache=300, keepalive_timeout=60
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"X-Riot-Token": self.api_key},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def get(self, path, params=None):
+        url = path if path.startswith("http") else self.base_url + path
+        session = self._ensure_session()
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            async with self._semaphore:
+                async with session.get(url, params=params) as resp:
+                    if resp.status == 429 or resp.status >= 500:
+                        if attempt < self.max_retries:
+                            retry_after = resp.headers.get("Retry-After")
+                            wait = float(retry_after) if retry_after else 2 ** attempt
+                            self.limiter.pause(wait)
+                            print(f"Riot API returned {resp.status} for {path}, retrying in {wait}s")
+                            continue
+                    resp.raise_for_status()
+                    return await resp.json()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,129 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+PUUID_TTL = 30 * 24 * 3600
+
+
+class LRU:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+
+    def get(self, key):
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return None
+        return self._data[key]
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RiotCache:
+    """Persistent cache for Riot lookups that rarely or never change.
+
+    Riot ID -> PUUID is kept for ``puuid_ttl`` seconds. Match ID -> {puuid: win} is kept
+    forever, since match-v5 only serves finished matches. Entries live in a small SQLite
+    file with a bounded in-memory LRU in front of it.
+
+    With ``memory_only`` the getters answer from the LRU alone and never block, so the
+    event loop can try them first and go to a worker thread on a miss; the setters
+    write to disk and belong on a worker thread too. The LRU has its own lock, so a
+    slow commit never holds up a memory lookup.
+    """
+
+    def __init__(self, path="riotCache.db", max_memory_entries=4096, puuid_ttl=PUUID_TTL):
+        self.puuid_ttl = puuid_ttl
+        self._memory = LRU(max_memory_entries)
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS puuids (
+                riot_id TEXT PRIMARY KEY,
+                puuid TEXT NOT NULL,
+                fetched_at INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS match_results (
+                match_id TEXT PRIMARY KEY,
+                results TEXT NOT NULL
+            );
+            """
+        )
+
+    def get_puuid(self, riot_id, memory_only=False):
+        key = ("puuid", riot_id.casefold())
+        with self._lock:
+            cached = self._memory.get(key)
+        if cached is None:
+            if memory_only:
+                return None
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT puuid, fetched_at FROM puuids WHERE riot_id = ?", (key[1],)
+                ).fetchone()
+            if row is None:
+                return None
+            cached = row
+            with self._lock:
+                self._memory.put(key, cached)
+        puuid, fetched_at = cached
+        if time.time() - fetched_at > self.puuid_ttl:
+            return None
+        return puuid
+
+    def set_puuid(self, riot_id, puuid):
+        key = ("puuid", riot_id.casefold())
+        fetched_at = int(time.time())
+        with self._lock:
+            self._memory.put(key, (puuid, fetched_at))
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO puuids (riot_id, puuid, fetched_at) VALUES (?, ?, ?)",
+                (key[1], puuid, fetched_at),
+            )
+            self._db.commit()
+
+    def get_match_result(self, match_id, memory_only=False):
+        """Return {puuid: win} for a cached match, or None."""
+        key = ("match", match_id)
+        with self._lock:
+            results = self._memory.get(key)
+        if results is None:
+            if memory_only:
+                return None
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT results FROM match_results WHERE match_id = ?", (match_id,)
+                ).fetchone()
+            if row is None:
+                return None
+            results = json.loads(row[0])
+            with self._lock:
+                self._memory.put(key, results)
+        return results
+
+    def set_match_result(self, match_id, results):
+        with self._lock:
+            self._memory.put(("match", match_id), results)
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO match_results (match_id, results) VALUES (?, ?)",
+                (match_id, json.dumps(results)),
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._db_lock:
+            self._db.close()
@@ -0,0 +1,134 @@
+import heapq
+from bisect import bisect_left
+from collections import Counter
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Trigram index over case-folded names for ranked, typo tolerant autocomplete.
+
+    Keys are whatever the caller wants back (a sound's filename, an account name). Queries
+    of one or two characters match word prefixes through a sorted word list; longer ones
+    score every key sharing a trigram with the query, with bonuses for exact, prefix and
+    substring hits. ``sync`` applies only the differences to the trigram postings and
+    re-sorts the word list and the name order once at the end, so an empty query is a
+    slice and a catalog change costs one sort rather than one list insert per word.
+
+    An index is not safe to change while it is searched; build a new one on a worker
+    thread and swap it in instead.
+    """
+
+    def __init__(self, items=None):
+        self.texts = {}
+        self._grams = {}
+        self._gram_counts = {}
+        self._words = []
+        self._sorted = []
+        if items:
+            self.sync(items)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, key, text):
+        self._add(key, text)
+        self._reorder()
+
+    def remove(self, key):
+        self._remove(key)
+        self._reorder()
+
+    def _add(self, key, text):
+        if key in self.texts:
+            self._remove(key)
+        text = text.casefold()
+        self.texts[key] = text
+        grams = trigrams(text)
+        self._gram_counts[key] = len(grams)
+        for gram in grams:
+            self._grams.setdefault(gram, set()).add(key)
+
+    def _remove(self, key):
+        text = self.texts.pop(key, None)
+        if text is None:
+            return
+        del self._gram_counts[key]
+        for gram in trigrams(text):
+            postings = self._grams[gram]
+            postings.discard(key)
+            if not postings:
+                del self._grams[gram]
+
+    def _reorder(self):
+        texts = self.texts
+        self._words = sorted((word, key) for key, text in texts.items() for word in set(text.split()))
+        self._sorted = sorted(texts, key=texts.get)
+
+    def sync(self, items):
+        """Make the index hold exactly ``items`` ({key: text}), touching only what changed."""
+        changed = False
+        for key in [k for k in self.texts if k not in items]:
+            self._remove(key)
+            changed = True
+        for key, text in items.items():
+            if self.texts.get(key) != text.casefold():
+                self._add(key, text)
+                changed = True
+        if changed:
+            self._reorder()
+
+    def search(self, query, limit=25):
+        query = query.casefold().strip()
+        if not query:
+            return self._sorted[:limit]
+        if len(query) < 3:
+            return self._prefix_search(query, limit)
+
+        query_grams = trigrams(query)
+        counts = Counter()
+        for gram in query_grams:
+            postings = self._grams.get(gram)
+            if postings:
+                counts.update(postings)
+        if not counts:
+            return []
+        texts = self.texts
+        gram_counts = self._gram_counts
+        n = len(query_grams)
+
+        def score(item):
+            key, shared = item
+            text = texts[key]
+            value = shared / (n + gram_counts[key] - shared)
+            if text == query:
+                value += 3
+            elif text.startswith(query):
+                value += 2
+            elif query in text:
+                value += 1
+            return value, -len(text)
+
+        # weak overlaps are noise unless nothing better exists
+        threshold = max(1, n // 2)
+        candidates = [item for item in counts.items() if item[1] >= threshold] or list(counts.items())
+        best = heapq.nlargest(limit, candidates, key=score)
+        return [key for key, _ in best]
+
+    def _prefix_search(self, prefix, limit):
+        # names starting with the prefix first, then names with a later word starting with it
+        starts, others = [], []
+        seen = set()
+        i = bisect_left(self._words, (prefix,))
+        words = self._words
+        while i < len(words) and words[i][0].startswith(prefix) and len(starts) < limit:
+            key = words[i][1]
+            if key not in seen:
+                seen.add(key)
+                (starts if self.texts[key].startswith(prefix) else others).append(key)
+            i += 1
+        starts.sort(key=lambda key: len(self.texts[key]))
+        return (starts + others)[:limit]
@@ -0,0 +1,168 @@
+import asyncio
+import random
+import threading
+import time
+from collections import Counter, deque
+
+POLICIES = ("uniform", "favorites", "fresh")
+HISTORY_SIZE = 10
+MAX_REDRAWS = 8
+# a sound's "fresh" weight is back to half an hour after it played, nearly full after a few hours
+FRESH_HALF_LIFE = 30 * 60
+FRESH_MIN_WEIGHT = 0.02
+# fresh tables are rebuilt at least this often, since their weights drift with time
+FRESH_REBUILD = 5 * 60
+
+
+class AliasTable:
+    """Walker/Vose alias table over a list of weights: O(n) to build, O(1) per draw."""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("AliasTable needs at least one positive weight")
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            # l gives away the rest of s's column
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # whatever is left over is 1 up to rounding
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def __len__(self):
+        return len(self.prob)
+
+    def draw(self, rng=random):
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class SoundPicker:
+    """Weighted random sound selection for random playback and /sound force.
+
+    Policies: ``uniform``; ``favorites``, weighted by 1 + the number of members who
+    favorited a sound; ``fresh``, weighted by how long ago a sound last played in any
+    guild, 1 - 2^(-age / ``half_life``), so recently played sounds come up less and
+    recover over time. Last-played times are kept in memory by ``played``; a sound
+    not played since start-up has full weight. Any policy can multiply the weight of
+    one category by ``boost``.
+
+    Alias tables are built per (policy, category, boost) and rebuilt only when the
+    catalog changes (for ``fresh`` also after a play, or every ``FRESH_REBUILD``
+    seconds). ``pick`` builds them on a worker thread, so a draw needs no file or
+    database access and a rebuild doesn't block the event loop. Each guild also keeps
+    a ring buffer of its last ``history_size`` sounds; a draw that hits one of them is
+    redrawn, up to ``max_redraws`` times, so the same sound doesn't come up twice in
+    a row.
+    """
+
+    def __init__(
+        self, catalog, history_size=HISTORY_SIZE, max_redraws=MAX_REDRAWS, half_life=FRESH_HALF_LIFE, rng=random
+    ):
+        self.catalog = catalog
+        self.history_size = history_size
+        self.max_redraws = max_redraws
+        self.half_life = half_life
+        self.rng = rng
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._history = {}
+        self._recent = {}
+        self._last_played = {}
+        self._plays = 0
+
+    def _stamp(self, policy, now=None):
+        if policy != "fresh":
+            return (self.catalog.version, None)
+        now = time.time() if now is None else now
+        return (self.catalog.version, (self._plays, int(now // FRESH_REBUILD)))
+
+    def weights(self, sounds, policy="uniform", category=None, boost=1.0, now=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown random sound policy {policy!r}")
+        now = time.time() if now is None else now
+        last_played = self._last_played
+        weights = []
+        for sound in sounds:
+            if policy == "favorites":
+                weight = 1.0 + len(sound.get('favoritedBy', []))
+            elif policy == "fresh":
+                played_at = last_played.get(sound['filename'])
+                if played_at is None:
+                    weight = 1.0
+                else:
+                    weight = max(FRESH_MIN_WEIGHT, 1.0 - 2.0 ** (-(now - played_at) / self.half_life))
+            else:
+                weight = 1.0
+            if category and sound.get('category') == category:
+                weight *= boost
+            weights.append(weight)
+        return weights
+
+    def cached(self, policy="uniform", category=None, boost=1.0):
+        """The cached (sounds, AliasTable) for a policy if it is up to date, else None."""
+        cached = self._tables.get((policy, category, boost))
+        if cached is not None and cached[0] == self._stamp(policy):
+            return cached[1], cached[2]
+        return None
+
+    def table(self, policy="uniform", category=None, boost=1.0):
+        """The (sounds, AliasTable) for a policy, or (sounds, None) when no sound has any weight.
+
+        Builds the table when it is out of date, which blocks; see ``pick``.
+        """
+        key = (policy, category, boost)
+        now = time.time()
+        stamp = self._stamp(policy, now)
+        with self._lock:
+            cached = self._tables.get(key)
+            if cached is not None and cached[0] == stamp:
+                return cached[1], cached[2]
+            sounds = self.catalog.sounds
+            weights = self.weights(sounds, policy, category, boost, now)
+            # a zero boost can leave nothing to pick from
+            table = AliasTable(weights) if any(weights) else None
+            # stale stamps for other keys are rebuilt on their next use
+            self._tables[key] = (stamp, sounds, table)
+        return sounds, table
+
+    async def pick(self, guild_id, policy="uniform", category=None, boost=1.0):
+        """Draw a sound filename for ``guild_id``, or None if there is nothing to pick."""
+        cached = self.cached(policy, category, boost)
+        if cached is None:
+            cached = await asyncio.to_thread(self.table, policy, category, boost)
+        sounds, table = cached
+        if table is None:
+            return None
+        recent = self._recent.get(guild_id, ())
+        for _ in range(self.max_redraws + 1):
+            filename = sounds[table.draw(self.rng)]['filename']
+            if filename not in recent:
+                break
+        return filename
+
+    def played(self, guild_id, filename):
+        """Remember a sound played in ``guild_id``, so random picks skip it for a while."""
+        self._last_played[filename] = time.time()
+        self._plays += 1
+        history = self._history.get(guild_id)
+        if history is None:
+            history = self._history[guild_id] = deque()
+            self._recent[guild_id] = Counter()
+        recent = self._recent[guild_id]
+        history.append(filename)
+        recent[filename] += 1
+        if len(history) > self.history_size:
+            oldest = history.popleft()
+            recent[oldest] -= 1
+            if not recent[oldest]:
+                del recent[oldest]
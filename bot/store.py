@@ -0,0 +1,300 @@
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sounds (
+    filename TEXT PRIMARY KEY,
+    displayname TEXT NOT NULL,
+    sort_key TEXT NOT NULL,
+    category TEXT,
+    uploaded_by TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sounds_by_sort_key ON sounds (sort_key);
+CREATE TABLE IF NOT EXISTS favorites (
+    user_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (user_id, filename)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS favorites_by_filename ON favorites (filename, position);
+CREATE TABLE IF NOT EXISTS plays (
+    filename TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    name TEXT,
+    times INTEGER NOT NULL,
+    PRIMARY KEY (filename, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS entrance_sounds (
+    user_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lol_accounts (
+    account_key TEXT PRIMARY KEY,
+    account TEXT NOT NULL,
+    discord_id TEXT NOT NULL UNIQUE
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# every statement is a constant, so each pooled connection compiles it once and reuses it
+GET_META = "SELECT value FROM meta WHERE key = ?"
+SET_META = "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value"
+INSERT_SOUND = (
+    "INSERT INTO sounds (filename, displayname, sort_key, category, uploaded_by) VALUES (?, ?, ?, ?, ?)"
+)
+INSERT_FAVORITE = "INSERT OR IGNORE INTO favorites (user_id, filename, position) VALUES (?, ?, ?)"
+SELECT_SOUNDS = "SELECT filename, displayname, category, uploaded_by FROM sounds ORDER BY sort_key"
+SELECT_FAVORITES = "SELECT filename, user_id FROM favorites ORDER BY filename, position"
+SOUND_EXISTS = "SELECT 1 FROM sounds WHERE filename = ?"
+ADD_PLAYS = (
+    "INSERT INTO plays (filename, user_id, name, times) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (filename, user_id) DO UPDATE SET times = times + excluded.times, name = excluded.name"
+)
+SELECT_PLAYS = "SELECT filename, user_id, name, times FROM plays ORDER BY filename, times DESC"
+INSERT_ENTRANCE = "INSERT OR REPLACE INTO entrance_sounds (user_id, filename) VALUES (?, ?)"
+SELECT_ENTRANCES = "SELECT user_id, filename FROM entrance_sounds"
+SELECT_LOL_ACCOUNTS = "SELECT account, discord_id FROM lol_accounts ORDER BY account_key"
+LOL_ACCOUNT_BY_USER = "SELECT account FROM lol_accounts WHERE discord_id = ?"
+LOL_ACCOUNT_BY_KEY = "SELECT account FROM lol_accounts WHERE account_key = ?"
+INSERT_LOL_ACCOUNT = "INSERT INTO lol_accounts (account_key, account, discord_id) VALUES (?, ?, ?)"
+IMPORT_LOL_ACCOUNT = "INSERT OR IGNORE INTO lol_accounts (account_key, account, discord_id) VALUES (?, ?, ?)"
+DELETE_LOL_ACCOUNT = "DELETE FROM lol_accounts WHERE account_key = ?"
+
+
+def file_stamp(path):
+    """mtime and size of a file as a string, None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+class Store:
+    """The bot's SQLite database (WAL mode) for sounds, favorites, play counts, entrance
+    sounds and tracked LoL accounts.
+
+    Connections come from a small pool so worker threads can read while another writes;
+    ``call`` runs a method on a worker thread for use from the event loop. Every write is
+    one transaction, so a crash or a concurrent writer never leaves half an update.
+
+    The web backend still owns sounds.json (uploads, renames, favorites) and users.json
+    (entrance sounds). They are imported whenever they change on disk, and the bot never
+    writes them. Play counts and LoL accounts belong to the bot; play counts are
+    exported to playCounts.json for the backend to serve.
+    """
+
+    def __init__(self, path="bot.db", pool_size=4):
+        self.path = path
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+        self._opened = 0
+        self._pool_lock = threading.Lock()
+        self._schema_ready = False
+        self.lol_version = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        if not self._schema_ready:
+            conn.executescript(SCHEMA)
+            self._schema_ready = True
+        return conn
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                can_open = self._opened < self.pool_size
+                if can_open:
+                    self._opened += 1
+            conn = self._connect() if can_open else self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """A pooled connection inside BEGIN IMMEDIATE, committed on success."""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    async def call(self, method, *args):
+        """Run a blocking store method on a worker thread."""
+        return await asyncio.to_thread(method, *args)
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        self._opened = 0
+
+    def _stamp_changed(self, conn, path):
+        stamp = file_stamp(path)
+        row = conn.execute(GET_META, (f"stamp:{path}",)).fetchone()
+        return stamp is not None and (row is None or row[0] != stamp), stamp
+
+    # sounds.json
+
+    def import_sounds(self, path="sounds.json", force=False):
+        """Replace sounds and favorites with the contents of sounds.json if it changed
+        since the last import. Returns True if anything was imported."""
+        with self.connection() as conn:
+            changed, stamp = self._stamp_changed(conn, path)
+        if not changed and not (force and stamp):
+            return False
+        with open(path, 'r') as f:
+            sounds = json.load(f)
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM sounds")
+            conn.execute("DELETE FROM favorites")
+            conn.executemany(INSERT_SOUND, (
+                (
+                    s['filename'], s['displayname'], s['displayname'].casefold(),
+                    s.get('category'), json.dumps(s['uploadedBy']) if 'uploadedBy' in s else None,
+                )
+                for s in sounds
+            ))
+            conn.executemany(INSERT_FAVORITE, (
+                (str(user_id), s['filename'], position)
+                for s in sounds
+                for position, user_id in enumerate(s.get('favoritedBy', []))
+            ))
+            # playedBy in sounds.json is history from before the bot kept counts here
+            if conn.execute(GET_META, ("plays_imported",)).fetchone() is None:
+                conn.executemany(ADD_PLAYS, (
+                    (s['filename'], str(p['id']), p.get('name'), p['times'])
+                    for s in sounds
+                    for p in s.get('playedBy', [])
+                ))
+                conn.execute(SET_META, ("plays_imported", "1"))
+            conn.execute(SET_META, (f"stamp:{path}", stamp))
+        return True
+
+    def sounds(self):
+        """Every sound in sounds.json's shape (without playedBy), in display order."""
+        with self.connection() as conn:
+            rows = conn.execute(SELECT_SOUNDS).fetchall()
+            favorites = conn.execute(SELECT_FAVORITES).fetchall()
+        favorited_by = {}
+        for filename, user_id in favorites:
+            favorited_by.setdefault(filename, []).append(user_id)
+        sounds = []
+        for filename, displayname, category, uploaded_by in rows:
+            sound = {"filename": filename, "displayname": displayname, "category": category}
+            if uploaded_by is not None:
+                sound["uploadedBy"] = json.loads(uploaded_by)
+            sound["favoritedBy"] = favorited_by.get(filename, [])
+            sounds.append(sound)
+        return sounds
+
+    # play counts
+
+    def add_plays(self, pending, names):
+        """Add {(filename, user_id): times} to the play counts in one transaction.
+        Plays of sounds that no longer exist are dropped. Returns the plays written."""
+        written = 0
+        with self.transaction() as conn:
+            for (filename, user_id), times in pending.items():
+                if conn.execute(SOUND_EXISTS, (filename,)).fetchone() is None:
+                    continue
+                conn.execute(ADD_PLAYS, (filename, user_id, names.get(user_id), times))
+                written += times
+        return written
+
+    def play_counts(self):
+        """{filename: [{"id", "name", "times"}]}, the playedBy lists the frontend shows."""
+        counts = {}
+        with self.connection() as conn:
+            for filename, user_id, name, times in conn.execute(SELECT_PLAYS):
+                counts.setdefault(filename, []).append({"id": user_id, "name": name, "times": times})
+        return counts
+
+    # users.json
+
+    def import_users(self, path="users.json", force=False):
+        """Replace the entrance sounds with users.json if it changed since the last import."""
+        with self.connection() as conn:
+            changed, stamp = self._stamp_changed(conn, path)
+        if not changed and not (force and stamp):
+            return False
+        with open(path, 'r') as f:
+            users = json.load(f)
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM entrance_sounds")
+            conn.executemany(INSERT_ENTRANCE, (
+                (str(user["id"]), user["entrance_sound"]) for user in users if user.get("entrance_sound")
+            ))
+            conn.execute(SET_META, (f"stamp:{path}", stamp))
+        return True
+
+    def entrance_sounds(self):
+        """{user id: filename} for every member with an entrance sound."""
+        with self.connection() as conn:
+            return dict(conn.execute(SELECT_ENTRANCES).fetchall())
+
+    # LoL accounts
+
+    def import_lol_users(self, path="lolUsers.json"):
+        """One-shot import of lolUsers.json. The old file is kept as lolUsers.json.migrated."""
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'r') as f:
+            lol_users = json.load(f)
+        with self.transaction() as conn:
+            conn.executemany(
+                IMPORT_LOL_ACCOUNT,
+                ((user["account"].casefold(), user["account"], str(user["discord_id"])) for user in lol_users),
+            )
+        os.replace(path, path + ".migrated")
+        self.lol_version += 1
+        print(f"Migrated {len(lol_users)} LoL account(s) from {path} to {self.path}")
+        return len(lol_users)
+
+    def lol_accounts(self):
+        """[{"account", "discord_id"}] for every tracked account."""
+        with self.connection() as conn:
+            rows = conn.execute(SELECT_LOL_ACCOUNTS).fetchall()
+        return [{"account": account, "discord_id": discord_id} for account, discord_id in rows]
+
+    def add_lol_account(self, account, discord_id):
+        """Track ``account`` for ``discord_id``. Returns None on success, or "user" / "account"
+        when that member already has an account or the account is already tracked."""
+        with self.transaction() as conn:
+            if conn.execute(LOL_ACCOUNT_BY_USER, (str(discord_id),)).fetchone():
+                return "user"
+            if conn.execute(LOL_ACCOUNT_BY_KEY, (account.casefold(),)).fetchone():
+                return "account"
+            conn.execute(INSERT_LOL_ACCOUNT, (account.casefold(), account, str(discord_id)))
+        self.lol_version += 1
+        return None
+
+    def remove_lol_account(self, account):
+        with self.transaction() as conn:
+            removed = conn.execute(DELETE_LOL_ACCOUNT, (account.casefold(),)).rowcount
+        self.lol_version += 1
+        return removed > 0
+
+
+store = Store()
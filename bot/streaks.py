@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+
+DEFAULT_STREAK_LENGTH = 2
+WIN_SUFFIX = "(win streak)"
+LOSS_SUFFIX = "(loss streak)"
+
+
+class StreakTracker:
+    """Running win/loss streak per tracked LoL account, persisted to a JSON file.
+
+    For every account it remembers the newest match ID already folded in, the current
+    streak length and direction, and the last nickname the bot applied. A poll whose
+    newest match ID is unchanged does nothing; otherwise only the new matches are
+    folded into the running streak.
+    """
+
+    def __init__(self, path="lolStreaks.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.accounts = {}
+        self.guilds = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self.accounts = data.get("accounts", {})
+            self.guilds = data.get("guilds", {})
+
+    def save(self):
+        with self._lock:
+            data = {"accounts": self.accounts, "guilds": self.guilds}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def streak_length(self, guild_id):
+        return self.guilds.get(str(guild_id), {}).get("streak_length", DEFAULT_STREAK_LENGTH)
+
+    def set_streak_length(self, guild_id, length):
+        self.guilds.setdefault(str(guild_id), {})["streak_length"] = length
+        # make the next poll re-evaluate every account against the new length
+        for state in self.accounts.values():
+            state["last_match_id"] = None
+        self.save()
+
+    def state(self, account):
+        return self.accounts.get(account.casefold())
+
+    def forget(self, account):
+        if self.accounts.pop(account.casefold(), None) is not None:
+            self.save()
+
+    def new_match_ids(self, account, match_ids):
+        """Return the match IDs (newest first, as Riot lists them) not yet folded in."""
+        state = self.state(account)
+        if not state or state["last_match_id"] not in match_ids:
+            return list(match_ids)
+        return list(match_ids[:match_ids.index(state["last_match_id"])])
+
+    def fold(self, account, match_ids, wins):
+        """Fold new results into the streak. Both lists are newest first, as Riot returns them."""
+        key = account.casefold()
+        state = self.accounts.get(key)
+        if not state or state["last_match_id"] not in match_ids:
+            # first poll, or more new games than the window holds: restart from the window
+            state = {"last_match_id": None, "streak": 0, "win": None, "nick": state and state.get("nick")}
+        for win in reversed(wins):
+            if win == state["win"]:
+                state["streak"] += 1
+            else:
+                state["win"] = win
+                state["streak"] = 1
+        if match_ids:
+            state["last_match_id"] = match_ids[0]
+        self.accounts[key] = state
+        return state
+
+    def set_nick(self, account, nick):
+        self.accounts[account.casefold()]["nick"] = nick
+
+
+def streak_nick(display_name, state, streak_length):
+    """Return display_name with the streak suffix that matches the account's state."""
+    base = display_name.replace(WIN_SUFFIX, "").replace(LOSS_SUFFIX, "").strip()
+    if state["streak"] >= streak_length:
+        return f"{base} {WIN_SUFFIX if state['win'] else LOSS_SUFFIX}"
+    return base
@@ -0,0 +1,203 @@
+import asyncio
+import time
+from collections import deque, namedtuple
+
+from metrics import CLICK_TO_PLAY_SECONDS
+from mixer import Mixer
+
+# ``prepared`` is an already opened (source, gain) pair; ``latency`` is the histogram
+# that gets the time from ``requested_at`` until the sound reaches the mixer; ``started``
+# is the future enqueue returns
+PlayRequest = namedtuple("PlayRequest", "sound member requested_at prepared latency started")
+
+
+def _discard(prepared):
+    if prepared is not None:
+        prepared[0].cleanup()
+
+
+def _resolve(future, started):
+    if not future.done():
+        future.set_result(started)
+
+
+def _drop(request):
+    _discard(request.prepared)
+    _resolve(request.started, False)
+
+
+class VoiceSession:
+    """Voice client, mixer and playback queue for a single guild.
+
+    Requests are queued and handed to the guild's mixer by a consumer task, so up to
+    ``max_voices`` sounds play at once. While every voice is busy, requests wait in the
+    queue; the consumer wakes up when the mixer reports a finished track. A sound
+    already waiting in the queue is not queued twice, and when the queue is full the
+    oldest waiting request is dropped.
+    """
+
+    def __init__(self, guild_id, prepare, max_queue=8, max_voices=8):
+        self.guild_id = guild_id
+        self.voice_client = None
+        self.max_queue = max_queue
+        self._prepare = prepare
+        self._queue = deque()
+        self._wakeup = asyncio.Event()
+        self._capacity = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self.mixer = Mixer(
+            max_voices, on_track_end=lambda: self._loop.call_soon_threadsafe(self._capacity.set)
+        )
+        self._task = None
+
+    def is_connected(self):
+        return self.voice_client is not None and self.voice_client.is_connected()
+
+    def enqueue(self, sound, member=None, requested_at=None, prepared=None, latency=CLICK_TO_PLAY_SECONDS):
+        """Queue a sound. Returns a future that resolves to True once the sound reaches the
+        mixer, or False if it was dropped. A sound already waiting is not queued again, its
+        request's future is returned instead.
+
+        ``requested_at`` is the ``time.perf_counter()`` of the click that asked for it, if any.
+        ``prepared`` skips the session's prepare step for a source the caller opened itself.
+        """
+        for request in self._queue:
+            if request.sound == sound:
+                _discard(prepared)
+                return request.started
+        if len(self._queue) >= self.max_queue:
+            dropped = self._queue.popleft()
+            _drop(dropped)
+            print(f"Playback queue full in guild {self.guild_id}, dropped {dropped.sound}")
+        started = self._loop.create_future()
+        self._queue.append(PlayRequest(sound, member, requested_at, prepared, latency, started))
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return started
+
+    def pending(self):
+        return len(self._queue)
+
+    async def _run(self):
+        while True:
+            while not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            while self.mixer.is_full():
+                self._capacity.clear()
+                if self.mixer.is_full():
+                    await self._capacity.wait()
+            request = self._queue.popleft()
+            vc = self.voice_client
+            if vc is None or not vc.is_connected():
+                _drop(request)
+                self._clear_queue()
+                continue
+            if request.prepared is not None:
+                source, gain = request.prepared
+            else:
+                try:
+                    # opening a sound reads files and may start ffmpeg
+                    source, gain = await asyncio.to_thread(self._prepare, request.sound, request.member)
+                except Exception as e:
+                    print(f"Error preparing sound effect {request.sound}: {e}")
+                    _resolve(request.started, False)
+                    continue
+                vc = self.voice_client
+                if vc is None or not vc.is_connected():
+                    source.cleanup()
+                    _drop(request)
+                    self._clear_queue()
+                    continue
+            self.mixer.add(source, gain)
+            self._ensure_playing()
+            _resolve(request.started, True)
+            if request.requested_at is not None:
+                request.latency.observe(time.perf_counter() - request.requested_at)
+
+    def _clear_queue(self):
+        for request in self._queue:
+            _drop(request)
+        self._queue.clear()
+
+    def _ensure_playing(self, error=None):
+        if error:
+            print(f"Error playing sound effects in guild {self.guild_id}: {error}")
+        vc = self.voice_client
+        if vc is None or not vc.is_connected() or vc.is_playing() or not self.mixer.active():
+            return
+        # the mixer ends playback when it runs dry; restart it if tracks were added since
+        vc.play(self.mixer, after=lambda e: self._loop.call_soon_threadsafe(self._ensure_playing, e))
+
+    def close(self):
+        self._clear_queue()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.mixer.clear()
+        self.voice_client = None
+
+
+class VoiceSessionManager:
+    """Per-guild voice sessions, keyed by guild id.
+
+    ``on_connect(guild_id)`` and ``on_disconnect(guild_id)`` are called when the bot joins
+    or leaves a guild's voice through the manager.
+    """
+
+    def __init__(self, prepare, max_queue=8, max_voices=8, on_connect=None, on_disconnect=None):
+        self._prepare = prepare
+        self.max_queue = max_queue
+        self.max_voices = max_voices
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.sessions = {}
+        self._connecting = {}
+
+    def get(self, guild_id):
+        session = self.sessions.get(guild_id)
+        if session is None:
+            session = VoiceSession(guild_id, self._prepare, self.max_queue, self.max_voices)
+            self.sessions[guild_id] = session
+        return session
+
+    def attach(self, voice_client):
+        session = self.get(voice_client.guild.id)
+        session.voice_client = voice_client
+        return session
+
+    async def connect(self, channel):
+        """Connect to (or move into) a voice channel and attach the client to its guild's session.
+
+        Connects to the same guild are serialized, so clicks that arrive while the bot is
+        still joining wait for that handshake instead of starting a second one.
+        """
+        lock = self._connecting.get(channel.guild.id)
+        if lock is None:
+            lock = self._connecting[channel.guild.id] = asyncio.Lock()
+        async with lock:
+            vc = channel.guild.voice_client
+            if vc and vc.is_connected():
+                if vc.channel != channel:
+                    await vc.move_to(channel)
+            else:
+                vc = await channel.connect()
+        session = self.attach(vc)
+        if self.on_connect:
+            self.on_connect(channel.guild.id)
+        return session
+
+    async def disconnect(self, guild_id):
+        if self.on_disconnect:
+            self.on_disconnect(guild_id)
+        session = self.sessions.pop(guild_id, None)
+        if session is None:
+            return
+        vc = session.voice_client
+        session.close()
+        if vc is not None and vc.is_connected():
+            await vc.disconnect()
+
+    def connected(self):
+        return [session for session in self.sessions.values() if session.is_connected()]
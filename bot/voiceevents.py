@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections import deque, namedtuple
+
+VoiceEvent = namedtuple("VoiceEvent", "timestamp member before after")
+
+
+def is_flap(before, after):
+    """True for an update that only toggles mute/deafen within the same channel."""
+    return (
+        before.channel is not None
+        and before.channel == after.channel
+        and before.self_stream == after.self_stream
+        and (before.self_mute != after.self_mute or before.self_deaf != after.self_deaf)
+    )
+
+
+class VoiceEventPipeline:
+    """Takes voice state updates off the gateway handler.
+
+    ``submit`` only records a VoiceEvent and hands it to every handler's queue for the
+    member's guild. Each (handler, guild) queue has its own worker task, started when an
+    event arrives and finished once the queue is empty, so a slow voice connect holds
+    up neither logging nor other guilds, while one guild's events are still handled
+    in order. Mute/deafen toggles are held back per member for ``coalesce_seconds``
+    and merged into one event, or dropped when the member ends up where they started.
+    """
+
+    def __init__(self, handlers, coalesce_seconds=2.0, max_queue=10000):
+        self.handlers = handlers
+        self.coalesce_seconds = coalesce_seconds
+        self.max_queue = max_queue
+        self._queues = {}
+        self._workers = {}
+        self._flaps = {}
+
+    def submit(self, member, before, after):
+        event = VoiceEvent(time.time(), member, before, after)
+        if is_flap(before, after):
+            self._coalesce(event)
+            return
+        # keep the member's events in order: a held back toggle goes out first
+        self._release_flap(member.id)
+        self._dispatch(event)
+
+    def _coalesce(self, event):
+        pending = self._flaps.get(event.member.id)
+        if pending is None:
+            handle = asyncio.get_running_loop().call_later(
+                self.coalesce_seconds, self._release_flap, event.member.id
+            )
+            self._flaps[event.member.id] = (event, handle)
+        else:
+            first, handle = pending
+            merged = VoiceEvent(event.timestamp, event.member, first.before, event.after)
+            self._flaps[event.member.id] = (merged, handle)
+
+    def _release_flap(self, member_id):
+        pending = self._flaps.pop(member_id, None)
+        if pending is None:
+            return
+        event, handle = pending
+        handle.cancel()
+        before, after = event.before, event.after
+        if before.self_mute == after.self_mute and before.self_deaf == after.self_deaf:
+            # toggled back and forth, nothing changed in the end
+            return
+        self._dispatch(event)
+
+    def _dispatch(self, event):
+        loop = asyncio.get_running_loop()
+        guild_id = event.member.guild.id
+        for index in range(len(self.handlers)):
+            key = (index, guild_id)
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = deque()
+            if len(queue) >= self.max_queue:
+                print(f"Voice event queue full, dropped event for {event.member.id}")
+                continue
+            queue.append(event)
+            if key not in self._workers:
+                self._workers[key] = loop.create_task(self._worker(key, queue))
+
+    async def _worker(self, key, queue):
+        handler = self.handlers[key[0]]
+        try:
+            while queue:
+                event = queue.popleft()
+                try:
+                    await handler(event)
+                except Exception as e:
+                    print(f"Error handling voice event in {handler.__name__}: {e}")
+        finally:
+            # nothing is awaited between the empty check and here, so no event is left behind
+            del self._queues[key]
+            del self._workers[key]
+
+    def pending(self):
+        return sum(len(queue) for queue in self._queues.values()) + len(self._flaps)
@@ -0,0 +1,138 @@
+import asyncio
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+STACK_LIMIT = 40
+
+
+class LoopWatchdog:
+    """Measures event loop lag and finds out what blocked the loop.
+
+    A heartbeat task sleeps for ``interval`` at a time and records how late it woke up.
+    A side thread checks on the heartbeat; once it is ``threshold`` overdue the loop is
+    stuck in synchronous code, and the thread captures the loop thread's stack right
+    then, while the blocking call is still on it. When the heartbeat gets through again
+    the stall is recorded with its duration, that stack, and the innermost frame in the
+    bot's own code as its call site.
+
+    The ``keep`` longest stalls and the ``keep`` most recent ones are kept for
+    ``report``.
+    """
+
+    def __init__(self, threshold=0.1, interval=0.05, keep=20, code_dir=None):
+        self.threshold = threshold
+        self.interval = interval
+        self.keep = keep
+        self.code_dir = code_dir or os.path.dirname(os.path.abspath(__file__))
+        self.stalls = 0
+        self.recent = deque(maxlen=keep)
+        self._worst = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._beat = None
+        self._capture = None
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start watching the running loop. Calling it again while running is a no-op."""
+        if self._task is not None and not self._task.done():
+            return
+        loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = loop.create_task(self._heartbeat())
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            with self._lock:
+                self._beat = now
+                capture, self._capture = self._capture, None
+            LOOP_LAG_SECONDS.observe(lag)
+            if lag >= self.threshold:
+                self._record(lag, capture)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            with self._lock:
+                overdue = time.monotonic() - self._beat - self.interval
+                if overdue < self.threshold or self._capture is not None:
+                    continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame, limit=STACK_LIMIT)
+            del frame
+            with self._lock:
+                if self._capture is None:
+                    self._capture = (time.time() - overdue, stack)
+
+    def call_site(self, stack):
+        """``file:line in function`` of the innermost frame in the bot's own code."""
+        for frame in reversed(stack):
+            if frame.filename.startswith(self.code_dir) and frame.filename != __file__:
+                return f"{os.path.relpath(frame.filename, self.code_dir)}:{frame.lineno} in {frame.name}"
+        if stack:
+            return f"{stack[-1].filename}:{stack[-1].lineno} in {stack[-1].name}"
+        return "unknown"
+
+    def _record(self, duration, capture):
+        if capture is not None:
+            started_at, stack = capture
+        else:
+            # the stall ended before the watch thread looked
+            started_at, stack = time.time() - duration, []
+        stall = {
+            "duration": duration,
+            "started_at": started_at,
+            "site": self.call_site(stack),
+            "stack": traceback.format_list(stack),
+        }
+        LOOP_STALLS.inc()
+        with self._lock:
+            self.stalls += 1
+            self.recent.append(stall)
+            entry = (duration, next(self._order), stall)
+            if len(self._worst) < self.keep:
+                heapq.heappush(self._worst, entry)
+            else:
+                heapq.heappushpop(self._worst, entry)
+        print(f"Event loop blocked for {duration * 1000:.0f}ms at {stall['site']}")
+
+    def worst(self):
+        """The longest stalls kept, longest first."""
+        with self._lock:
+            return [stall for _, _, stall in sorted(self._worst, key=lambda entry: entry[0], reverse=True)]
+
+    def report(self):
+        """Plain text dump of the worst stalls with their stacks."""
+        lines = [f"{self.stalls} stall(s) over {self.threshold * 1000:g}ms since start", ""]
+        for stall in self.worst():
+            started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stall["started_at"]))
+            lines.append(f"{stall['duration'] * 1000:.0f}ms at {started} in {stall['site']}")
+            lines.extend(line.rstrip("\n") for line in stall["stack"])
+            lines.append("")
+        return "\n".join(lines)